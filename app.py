@@ -4,7 +4,8 @@
 - Приложение (main(), инициализироватьСистему(), запуститьИнтерфейс())
 - КонтейнерЗависимостей
 """
-from flask import Flask, render_template, redirect, url_for, request
+import click
+from flask import Flask, Response, render_template, redirect, url_for, request, jsonify, abort
 from flask_login import login_required, current_user
 from config import Config
 from database import db, login_manager, init_db
@@ -31,22 +32,17 @@ def create_app(config_class=Config):
 
     register_main_routes(app)
     register_error_handlers(app)
+    register_commands(app)
 
     @app.context_processor
     def inject_notifications():
         """Добавляем уведомления в контекст всех шаблонов"""
         if current_user.is_authenticated:
-            from models.notification import Notification
-            unread_notifications = Notification.query.filter_by(
-                user_id=current_user.id,
-                is_read=False
-            ).order_by(Notification.created_at.desc()).limit(5).all()
-            unread_count = Notification.query.filter_by(
-                user_id=current_user.id,
-                is_read=False
-            ).count()
+            # счётчик хранится в строке пользователя, список загружается только если шаблон его использует
+            from services.notification_service import RecentUnread
+            unread_count = current_user.unread_notifications_count
             return dict(
-                unread_notifications=unread_notifications,
+                unread_notifications=RecentUnread(current_user.id, unread_count),
                 unread_count=unread_count
             )
         return dict(unread_notifications=[], unread_count=0)
@@ -86,9 +82,14 @@ def register_main_routes(app):
         resumes_count = Resume.query.filter_by(applicant_id=current_user.id).count()
         applications_count = Application.query.filter_by(applicant_id=current_user.id).count()
 
-        recent_vacancies = Vacancy.query.filter_by(status='published').order_by(
-            Vacancy.created_at.desc()
-        ).limit(5).all()
+        from services.recommendation_service import RecommendationService
+
+        recent_vacancies = RecommendationService.recommended_vacancies(current_user.id, limit=5)
+        recommended = bool(recent_vacancies)
+        if not recommended:
+            recent_vacancies = Vacancy.query.filter_by(status='published').order_by(
+                Vacancy.created_at.desc()
+            ).limit(5).all()
 
         my_applications = Application.query.filter_by(applicant_id=current_user.id).order_by(
             Application.created_at.desc()
@@ -98,6 +99,7 @@ def register_main_routes(app):
                                resumes_count=resumes_count,
                                applications_count=applications_count,
                                recent_vacancies=recent_vacancies,
+                               recommended=recommended,
                                my_applications=my_applications)
 
     @app.route('/employer/dashboard')
@@ -106,39 +108,26 @@ def register_main_routes(app):
         if current_user.role != 'employer':
             return redirect(url_for('main.home'))
 
+        from sqlalchemy.orm import contains_eager, joinedload
         from models.vacancy import Vacancy
         from models.application import Application
 
-        vacancies_count = Vacancy.query.filter_by(employer_id=current_user.id).count()
-        published_count = Vacancy.query.filter_by(
-            employer_id=current_user.id,
-            status='published'
-        ).count()
-
-        applications_count = Application.query.join(Application.vacancy).filter(
-            Application.vacancy.has(employer_id=current_user.id)
-        ).count()
-
-        pending_count = Application.query.join(Application.vacancy).filter(
-            Application.vacancy.has(employer_id=current_user.id),
-            Application.status == 'pending'
-        ).count()
+        stats = current_user.get_dashboard_stats()
 
         my_vacancies = Vacancy.query.filter_by(employer_id=current_user.id).order_by(
             Vacancy.created_at.desc()
         ).limit(5).all()
 
-        recent_applications = Application.query.join(Application.vacancy).filter(
-            Application.vacancy.has(employer_id=current_user.id)
+        recent_applications = Application.query.join(Application.vacancy).options(
+            contains_eager(Application.vacancy), joinedload(Application.applicant)
+        ).filter(
+            Vacancy.employer_id == current_user.id
         ).order_by(Application.created_at.desc()).limit(5).all()
 
         return render_template('employer_dashboard.html',
-                               vacancies_count=vacancies_count,
-                               published_count=published_count,
-                               applications_count=applications_count,
-                               pending_count=pending_count,
                                my_vacancies=my_vacancies,
-                               recent_applications=recent_applications)
+                               recent_applications=recent_applications,
+                               **stats)
 
     @app.route('/profile', methods=['GET', 'POST'])
     @login_required
@@ -169,11 +158,10 @@ def register_main_routes(app):
     @login_required
     def notifications():
         from models.notification import Notification
+        from services.pagination import keyset_paginate
 
-        page = request.args.get('page', 1, type=int)
-        notifications = Notification.query.filter_by(user_id=current_user.id).order_by(
-            Notification.created_at.desc()
-        ).paginate(page=page, per_page=20, error_out=False)
+        notifications = keyset_paginate(Notification.query.filter_by(user_id=current_user.id), Notification,
+                                        cursor=request.args.get('cursor'), per_page=20)
 
         return render_template('notifications.html', notifications=notifications)
 
@@ -188,6 +176,49 @@ def register_main_routes(app):
 
         return redirect(url_for('main.notifications'))
 
+    @app.route('/notifications/read-all', methods=['POST'])
+    @login_required
+    def mark_all_notifications_read():
+        from flask import flash
+        from services.notification_service import NotificationService
+
+        try:
+            NotificationService.mark_all_read(current_user.id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            flash('Ошибка при обновлении уведомлений', 'error')
+            print(f"Mark all notifications read error: {e}")
+
+        return redirect(url_for('main.notifications'))
+
+    @app.route('/notifications/stream')
+    @login_required
+    def notification_stream():
+        """Новые уведомления потоком Server-Sent Events"""
+        from services.notification_service import NotificationService
+
+        if not app.config.get('NOTIFICATIONS_LIVE_UPDATES', False):
+            abort(404)
+
+        after_id = request.headers.get('Last-Event-ID', type=int)
+        if after_id is None:
+            after_id = request.args.get('after', type=int)
+        return Response(NotificationService.stream(current_user.id, after_id), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/notifications/poll')
+    @login_required
+    def notification_poll():
+        """Новые уведомления для браузеров без Server-Sent Events (long-poll)"""
+        from services.notification_service import NotificationService
+
+        if not app.config.get('NOTIFICATIONS_LIVE_UPDATES', False):
+            abort(404)
+
+        notifications, last_id = NotificationService.wait_new(current_user.id, request.args.get('after', type=int))
+        return jsonify(notifications=notifications, last_id=last_id)
+
     from flask import Blueprint
     main_bp = Blueprint('main', __name__)
     main_bp.add_url_rule('/home', 'home', home)
@@ -197,6 +228,10 @@ def register_main_routes(app):
     main_bp.add_url_rule('/notifications', 'notifications', notifications)
     main_bp.add_url_rule('/notifications/<int:notif_id>/read', 'mark_notification_read',
                          mark_notification_read, methods=['POST'])
+    main_bp.add_url_rule('/notifications/read-all', 'mark_all_notifications_read',
+                         mark_all_notifications_read, methods=['POST'])
+    main_bp.add_url_rule('/notifications/stream', 'notification_stream', notification_stream)
+    main_bp.add_url_rule('/notifications/poll', 'notification_poll', notification_poll)
 
     app.register_blueprint(main_bp)
 
@@ -213,10 +248,80 @@ def register_error_handlers(app):
         return render_template('500.html'), 500
 
 
+def register_commands(app):
+    """
+    Служебные команды: flask --app app <команда>
+    """
+
+    @app.cli.command('backfill-skills')
+    def backfill_skills():
+        """Заполнить справочник навыков и связи по текущим резюме и вакансиям"""
+        from models.skill import Skill
+        from services.search_service import SearchService
+        processed = Skill.backfill()
+        SearchService.rebuild('resumes')
+        print(f"Обработано записей: {processed}")
+
+    @app.cli.command('refresh-recommendations')
+    def refresh_recommendations():
+        """Пересчитать рекомендации вакансий для всех соискателей"""
+        from services.recommendation_service import RecommendationService
+        processed = RecommendationService.refresh_all()
+        print(f"Обработано соискателей: {processed}")
+
+    @app.cli.command('find-duplicates')
+    def find_duplicates():
+        """Сгруппировать почти одинаковые вакансии и резюме"""
+        from services.duplicate_service import DuplicateService
+        for kind in DuplicateService.kinds:
+            print(f"{kind}: групп дубликатов {DuplicateService.cluster(kind)}")
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters():
+        """Пересчитать счётчики откликов у вакансий и непрочитанных уведомлений у пользователей"""
+        from models.vacancy import Vacancy
+        from services.notification_service import NotificationService
+        repaired = Vacancy.reconcile_counters()
+        print(f"Исправлено вакансий: {repaired}")
+        repaired = NotificationService.reconcile_unread_counts()
+        print(f"Исправлено счётчиков уведомлений: {repaired}")
+
+    @app.cli.command('deliver-notifications')
+    def deliver_notifications():
+        """Доставить уведомления, ожидающие в outbox"""
+        from services.notification_service import NotificationService
+        print(f"Доставлено уведомлений: {NotificationService.deliver_pending()}")
+
+    @app.cli.command('notify-all')
+    @click.argument('title')
+    @click.argument('message')
+    @click.option('--role', type=click.Choice(['applicant', 'employer', 'administrator']), help='Только пользователям этой роли')
+    def notify_all(title, message, role):
+        """Разослать уведомление всем незаблокированным пользователям"""
+        from services.notification_service import NotificationService
+        recipients = NotificationService.notify_all(title, message, role=role)
+        db.session.commit()
+        print(f"Получателей: {recipients}, доставлено уведомлений: {NotificationService.deliver_pending()}")
+
+    @app.cli.command('archive-notifications')
+    @click.option('--days', type=int, default=None, help='Срок хранения прочитанных уведомлений, дней')
+    def archive_notifications(days):
+        """Перенести старые прочитанные уведомления в архив"""
+        from services.notification_service import NotificationService
+        print(f"Перенесено в архив: {NotificationService.archive_read(days)}")
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats():
+        """Пересчитать статистику платформы по исходным таблицам"""
+        from services.stats_service import StatsService
+        for metric, value in StatsService.rebuild().items():
+            print(f"{metric}: {value}")
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    from models.user import User
-    return User.query.get(int(user_id))
+    from services.user_cache import UserCache
+    return UserCache.load(int(user_id))
 
 
 if __name__ == '__main__':
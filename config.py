@@ -9,6 +9,76 @@ class Config:
 
     RESUMES_PER_PAGE = 10
     VACANCIES_PER_PAGE = 10
+    APPLICATIONS_PER_PAGE = 20
+
+    # 'auto' - FTS5 для SQLite, иначе LIKE; можно явно указать 'fts5' или 'like'
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'
+    # приводить слова запроса к основе встроенным русским стеммером
+    SEARCH_STEMMING = True
+
+    VACANCY_SEARCH_CACHE_SIZE = 512
+    VACANCY_SEARCH_CACHE_TTL = 60
+
+    AUTOCOMPLETE_REBUILD_INTERVAL = 300
+
+    # подбор резюме для вакансии: сколько кандидатов показывать и как часто перестраивать матрицу
+    MATCHING_TOP_K = 10
+    MATCHING_REBUILD_INTERVAL = 600
+
+    # рекомендации вакансий соискателю: длина списка, срок жизни (сек), сколько близких резюме
+    # проверять при публикации вакансии
+    RECOMMENDATIONS_COUNT = 10
+    RECOMMENDATIONS_TTL = 86400
+    RECOMMENDATIONS_FANOUT = 1000
+    # пересчёт устаревших рекомендаций фоновым потоком (False - в запросе страницы): размер пачки и период (сек)
+    RECOMMENDATIONS_WORKER = True
+    RECOMMENDATIONS_BATCH_SIZE = 200
+    RECOMMENDATIONS_POLL_INTERVAL = 60
+
+    # порог сходства Жаккара, с которого вакансия/резюме считается копией
+    DUPLICATE_THRESHOLD = 0.8
+
+    # последние непрочитанные уведомления в шапке: сколько и сколько секунд хранить в кэше процесса
+    NOTIFICATIONS_RECENT_COUNT = 5
+    NOTIFICATIONS_CACHE_TTL = 30
+    # доставка уведомлений из outbox фоновым потоком: размер пачки и период проверки (сек)
+    NOTIFICATIONS_WORKER = True
+    NOTIFICATIONS_BATCH_SIZE = 500
+    NOTIFICATIONS_POLL_INTERVAL = 5
+    # новые уведомления на открытых страницах (SSE / long-poll): каждая страница держит соединение,
+    # поэтому включать только под асинхронным воркером (gunicorn -k gevent); иначе счётчик обновляется при загрузке страницы
+    NOTIFICATIONS_LIVE_UPDATES = False
+    # новые уведомления на странице: длительность потока SSE до переподключения, период keepalive
+    # и сколько ждёт запрос long-poll (сек)
+    NOTIFICATIONS_STREAM_TIMEOUT = 300
+    NOTIFICATIONS_HEARTBEAT = 15
+    NOTIFICATIONS_LONG_POLL_TIMEOUT = 25
+    # прочитанные уведомления старше срока (дней) переносятся в архив раз в NOTIFICATIONS_ARCHIVE_INTERVAL секунд
+    NOTIFICATIONS_RETENTION_DAYS = 90
+    NOTIFICATIONS_ARCHIVE_INTERVAL = 3600
+
+    # кэш пользователей для user_loader: сколько записей и сколько секунд хранить
+    USER_CACHE = True
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 60
+
+    # хэширование паролей в пуле процессов: алгоритм (при изменении пароли перехэшируются при входе),
+    # число процессов (None - по числу ядер, 0 - в потоке запроса), сколько задач допускать одновременно
+    # (None - 4 на процесс), сколько секунд ждать результат
+    PASSWORD_HASH_METHOD = 'scrypt'
+    PASSWORD_HASH_WORKERS = None
+    PASSWORD_HASH_MAX_PENDING = None
+    PASSWORD_HASH_TIMEOUT = 10
+
+    # профилирование SQL по запросам: запрос одной формы, повторённый больше SQL_REPEAT_THRESHOLD раз, - признак N+1;
+    # заголовки X-SQL-* (None - только в режиме отладки и тестов, иначе JSON-строка в лог)
+    SQL_PROFILING = True
+    SQL_REPEAT_THRESHOLD = 10
+    SQL_PROFILE_HEADERS = None
+
+    # метрики запросов по эндпоинтам (/admin/metrics); токен - для доступа сборщика метрик без входа
+    REQUEST_METRICS = True
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
 
     SESSION_COOKIE_HTTPONLY = True
     REMEMBER_COOKIE_HTTPONLY = True
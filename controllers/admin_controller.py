@@ -11,15 +11,29 @@
 - Удалить пользователя()(ДОБАВИЛ)
 - Разблокировать пользователя()(ДОБАВИЛ)
 - Удалить пользователя()(ДОБАВИЛ)
+- Дубликаты вакансий и резюме(ДОБАВИЛ)
+- Ряды статистики по дням/неделям/месяцам, JSON(ДОБАВИЛ)
+- Метрики запросов в формате Prometheus(ДОБАВИЛ)
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from datetime import datetime, date, timedelta
+import hmac
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, Response
 from flask_login import login_required, current_user
 from functools import wraps
 from database import db
 from models.user import User, Administrator
+from services.search_service import SearchService
+from services.search_cache import VacancySearchCache
+from services.duplicate_service import DuplicateService
+from services.stats_service import StatsService, SERIES, INTERVALS, MAX_SERIES_DAYS
+from services.request_metrics import RequestMetrics
+from services.pagination import keyset_paginate
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# до скольких совпадений считать найденных пользователей
+USERS_COUNT_LIMIT = 1000
+
 
 def admin_required(f):
     @wraps(f)
@@ -54,22 +68,20 @@ def users():
     """
     Реализует метод сформироватьОтчёт() - отчет по пользователям
     """
-    page = request.args.get('page', 1, type=int)
-    search_query = request.args.get('q', '')
+    cursor = request.args.get('cursor')
+    search_query = request.args.get('q', '').strip()
 
     if search_query:
-        users_pagination = User.query.filter(
-            db.or_(
-                User.name.ilike(f'%{search_query}%'),
-                User.email.ilike(f'%{search_query}%')
-            )
-        ).paginate(page=page, per_page=20, error_out=False)
+        # по релевантности; всего - без полного подсчёта, не больше USERS_COUNT_LIMIT
+        users_page, _ = SearchService.search('users', search_query, 20, cursor)
+        total, more = SearchService.count('users', search_query, limit=USERS_COUNT_LIMIT)
     else:
-        users_pagination = User.query.order_by(User.created_at.desc()).paginate(
-            page=page, per_page=20, error_out=False
-        )
+        # всего - из итогов статистики платформы вместо COUNT по таблице
+        users_page = keyset_paginate(User.query, User, cursor=cursor, per_page=20)
+        total, more = StatsService.totals().get('users', 0), False
 
-    return render_template('admin_users.html', users=users_pagination, search_query=search_query)
+    return render_template('admin_users.html', users=users_page, search_query=search_query,
+                           total=total, more=more)
 
 
 @admin_bp.route('/users/<int:user_id>/block', methods=['POST'])
@@ -140,26 +152,80 @@ def reports():
     """
     Реализует метод сформироватьОтчёт()
     """
-    from models.resume import Resume
-    from models.vacancy import Vacancy
-    from models.application import Application
-    from datetime import datetime, timedelta
+    totals = StatsService.totals()
+    basic_reports = StatsService.basic_report(totals)
+    detailed_reports = StatsService.detailed_report(totals=totals)
 
-    admin = Administrator.query.get(current_user.id)
-    basic_reports = admin.view_reports()
+    return render_template('admin_reports.html',
+                           basic_reports=basic_reports,
+                           detailed_reports=detailed_reports,
+                           search_cache=VacancySearchCache.stats())
 
-    last_month = datetime.utcnow() - timedelta(days=30)
 
-    detailed_reports = {
-        'new_users_last_month': User.query.filter(User.created_at >= last_month).count(),
-        'new_resumes_last_month': Resume.query.filter(Resume.created_at >= last_month).count(),
-        'new_vacancies_last_month': Vacancy.query.filter(Vacancy.created_at >= last_month).count(),
-        'new_applications_last_month': Application.query.filter(Application.created_at >= last_month).count(),
-        'published_vacancies': Vacancy.query.filter_by(status='published').count(),
-        'closed_vacancies': Vacancy.query.filter_by(status='closed').count(),
-        'pending_applications': Application.query.filter_by(status='pending').count(),
-    }
+@admin_bp.route('/api/stats')
+@login_required
+def stats_series():
+    """
+    Ряды статистики для графиков (JSON)
+    Параметры: metric (можно несколько, например users, vacancies_published, applications:pending),
+    start, end (YYYY-MM-DD, по умолчанию последние 30 дней), interval (day, week, month)
+    """
+    if current_user.role != 'administrator':
+        return jsonify(error='Требуются права администратора'), 403
 
-    return render_template('admin_reports.html',
-                           basic_reports=basic_reports,
-                           detailed_reports=detailed_reports)
+    metrics = request.args.getlist('metric') or ['users', 'vacancies_published', 'applications']
+    interval = request.args.get('interval', 'day')
+    try:
+        end = date.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow().date()
+        start = date.fromisoformat(request.args['start']) if 'start' in request.args else end - timedelta(days=29)
+    except ValueError:
+        return jsonify(error='Даты указываются в формате YYYY-MM-DD'), 400
+
+    if interval not in INTERVALS:
+        return jsonify(error=f"interval: одно из {', '.join(INTERVALS)}"), 400
+    unknown = [metric for metric in metrics if metric.split(':')[0] not in SERIES]
+    if unknown:
+        return jsonify(error=f"Неизвестные метрики: {', '.join(unknown)}"), 400
+    if start > end or (end - start).days >= MAX_SERIES_DAYS:
+        return jsonify(error=f'Период - от 1 до {MAX_SERIES_DAYS} дней'), 400
+
+    labels, series = StatsService.series(metrics, start, end, interval)
+    return jsonify(start=start.isoformat(), end=end.isoformat(), interval=interval,
+                   labels=[label.isoformat() for label in labels], series=series)
+
+
+@admin_bp.route('/metrics')
+def metrics():
+    """
+    Метрики запросов по эндпоинтам в текстовом формате Prometheus
+    Доступ - администратору или по заголовку Authorization: Bearer <METRICS_TOKEN> (для сборщика метрик)
+    """
+    token = RequestMetrics.token
+    authorization = request.headers.get('Authorization', '')
+    by_token = bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+    if not by_token and not (current_user.is_authenticated and current_user.role == 'administrator'):
+        return Response('Требуются права администратора\n', status=403, mimetype='text/plain')
+
+    return Response(RequestMetrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@admin_bp.route('/duplicates', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def duplicates():
+    """
+    Группы почти одинаковых вакансий и резюме; POST - заново сгруппировать существующие записи
+    """
+    if request.method == 'POST':
+        try:
+            found = {kind: DuplicateService.cluster(kind) for kind in DuplicateService.kinds}
+            flash(f"Найдено групп: вакансий {found['vacancy']}, резюме {found['resume']}", 'success')
+        except Exception as e:
+            db.session.rollback()
+            flash('Ошибка при поиске дубликатов', 'error')
+            print(f"Duplicate clustering error: {e}")
+        return redirect(url_for('admin.duplicates'))
+
+    return render_template('admin_duplicates.html',
+                           vacancy_groups=DuplicateService.groups('vacancy'),
+                           resume_groups=DuplicateService.groups('resume'))
@@ -8,12 +8,15 @@
 """
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, current_user
-from werkzeug.security import generate_password_hash
 from database import db
 from models.user import User, Applicant, Employer, Administrator
+from services.password_hasher import PasswordHasher, PasswordHasherBusy
 
 auth_bp = Blueprint('auth', __name__)
 
+BUSY_MESSAGE = 'Сервер перегружен, попробуйте ещё раз через несколько секунд'
+BUSY_HEADERS = {'Retry-After': '5'}
+
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -34,7 +37,16 @@ def login():
 
         user = User.query.filter_by(email=email).first()
 
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except PasswordHasherBusy:
+            flash(BUSY_MESSAGE, 'error')
+            return render_template('login.html'), 503, BUSY_HEADERS
+
+        if valid:
+            # check_password() мог обновить хэш пароля под новые параметры
+            db.session.commit()
+
             if user.is_blocked:
                 flash('Ваш аккаунт заблокирован. Обратитесь к администратору.', 'error')
                 return render_template('login.html')
@@ -89,12 +101,18 @@ def register():
             flash('Пользователь с таким email уже существует', 'error')
             return render_template('register.html')
 
+        try:
+            password_hash = PasswordHasher.hash(password)
+        except PasswordHasherBusy:
+            flash(BUSY_MESSAGE, 'error')
+            return render_template('register.html'), 503, BUSY_HEADERS
+
         try:
             if role == 'applicant':
                 user = Applicant(
                     name=name,
                     email=email,
-                    password=generate_password_hash(password),
+                    password=password_hash,
                     role='applicant'
                 )
             elif role == 'employer':
@@ -102,7 +120,7 @@ def register():
                 user = Employer(
                     name=name,
                     email=email,
-                    password=generate_password_hash(password),
+                    password=password_hash,
                     role='employer',
                     company_name=company_name
                 )
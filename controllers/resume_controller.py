@@ -10,12 +10,17 @@
 
 - Удалить резюме(ДОБАВИЛ)
 - Просмотр резюме (для работодателей)(ДОБАВИЛ)
+- Подсказки навыков для поиска резюме(ДОБАВИЛ)
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response, current_app, jsonify
 from flask_login import login_required, current_user
 from database import db
 from models.resume import Resume
+from models.skill import Skill
 from models.user import Applicant
+from services.pagination import keyset_paginate
+from services.search_service import SearchService
+from services.autocomplete_service import AutocompleteService
 
 resume_bp = Blueprint('resume', __name__, url_prefix='/resumes')
 
@@ -195,17 +200,37 @@ def search():
         return redirect(url_for('main.home'))
 
     query = request.args.get('q', '')
-    resumes = []
+    skills = request.args.get('skills', '')
+    skills_mode = request.args.get('skills_mode', 'all')
+    cursor = request.args.get('cursor')
+    per_page = current_app.config['RESUMES_PER_PAGE']
+    snippets = {}
+
+    skills_list = [skill.strip() for skill in skills.split(',') if skill.strip()]
+    match_all = skills_mode != 'any'
 
     if query:
-        resumes = Resume.query.filter(
-            db.or_(
-                Resume.title.ilike(f'%{query}%'),
-                Resume.skills.ilike(f'%{query}%'),
-                Resume.experience.ilike(f'%{query}%')
-            )
-        ).all()
+        resumes, snippets = SearchService.search('resumes', query, per_page, cursor,
+                                                 skills=skills_list, match_all=match_all)
+    elif skills_list:
+        resumes = keyset_paginate(Skill.resumes_with(skills_list, match_all), Resume,
+                                  cursor=cursor, per_page=per_page)
     else:
-        resumes = Resume.query.order_by(Resume.created_at.desc()).limit(50).all()
+        resumes = keyset_paginate(Resume.query, Resume, cursor=cursor, per_page=per_page)
+
+    return render_template('search_resumes.html', resumes=resumes, query=query,
+                           skills=skills, skills_mode=skills_mode, snippets=snippets)
+
+
+@resume_bp.route('/autocomplete')
+@login_required
+def autocomplete():
+    """
+    Подсказки для строки поиска резюме (JSON): навыки из резюме
+    """
+    if current_user.role != 'employer':
+        return jsonify(error='Только работодатели могут искать резюме'), 403
 
-    return render_template('search_resumes.html', resumes=resumes, query=query)
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 20)
+    return jsonify(query=query, suggestions=AutocompleteService.suggest('skills', query, limit))
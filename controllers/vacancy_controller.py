@@ -14,15 +14,24 @@
 - Мои вакансии (для работодателя)(ДОБАВИЛ)
 - Редактировать вакансию(ДОБАВИЛ)
 - Удалить вакансию(ДОБАВИЛ)
+- Подсказки для строки поиска(ДОБАВИЛ)
+- Подходящие резюме для вакансии (для работодателя)(ДОБАВИЛ)
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
 from database import db
 from models.vacancy import Vacancy
+from models.resume import Resume
 from models.application import Application
 from models.user import Employer, Applicant
 from models.notification import Notification
 from services.notification_service import NotificationService
+from services.search_cache import VacancySearchCache
+from services.autocomplete_service import AutocompleteService
+from services.matching_service import MatchingService
+from services.duplicate_service import DuplicateService
+from services.pagination import keyset_paginate
 
 vacancy_bp = Blueprint('vacancy', __name__, url_prefix='/vacancies')
 
@@ -35,21 +44,23 @@ def list_vacancies():
     Реализует метод найтиВакансии(фильтр)
     """
     query = request.args.get('q', '')
-    vacancies = []
-
-    if query:
-        vacancies = Vacancy.query.filter(
-            Vacancy.status == 'published',
-            db.or_(
-                Vacancy.title.ilike(f'%{query}%'),
-                Vacancy.description.ilike(f'%{query}%'),
-                Vacancy.requirements.ilike(f'%{query}%')
-            )
-        ).order_by(Vacancy.created_at.desc()).all()
-    else:
-        vacancies = Vacancy.query.filter_by(status='published').order_by(Vacancy.created_at.desc()).all()
+    cursor = request.args.get('cursor')
+    per_page = current_app.config['VACANCIES_PER_PAGE']
+
+    vacancies, snippets = VacancySearchCache.search(query, per_page, cursor)
+
+    return render_template('vacancies.html', vacancies=vacancies, query=query, snippets=snippets)
 
-    return render_template('vacancies.html', vacancies=vacancies, query=query)
+
+@vacancy_bp.route('/autocomplete')
+@login_required
+def autocomplete():
+    """
+    Подсказки для строки поиска вакансий (JSON): названия вакансий и требования
+    """
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 20)
+    return jsonify(query=query, suggestions=AutocompleteService.suggest('vacancies', query, limit))
 
 
 @vacancy_bp.route('/<int:vacancy_id>')
@@ -67,7 +78,12 @@ def view(vacancy_id):
             vacancy_id=vacancy_id
         ).first() is not None
 
-    return render_template('vacancy_detail.html', vacancy=vacancy, has_applied=has_applied)
+    matching_resumes = []
+    if current_user.role == 'employer' and vacancy.employer_id == current_user.id:
+        matching_resumes = MatchingService.match_resumes(vacancy, current_app.config['MATCHING_TOP_K'])
+
+    return render_template('vacancy_detail.html', vacancy=vacancy, has_applied=has_applied,
+                           matching_resumes=matching_resumes)
 
 
 @vacancy_bp.route('/<int:vacancy_id>/apply', methods=['POST'])
@@ -103,9 +119,9 @@ def apply(vacancy_id):
 
         if application:
             application.cover_letter = cover_letter
-            db.session.commit()
-
+            # уведомление работодателю сохраняется тем же коммитом (outbox), доставляется в фоне
             NotificationService.notify_application(vacancy.employer, application)
+            db.session.commit()
 
             flash('Отклик успешно отправлен!', 'success')
         else:
@@ -129,7 +145,9 @@ def my_vacancies():
         flash('Только работодатели могут просматривать свои вакансии', 'error')
         return redirect(url_for('main.home'))
 
-    vacancies = Vacancy.query.filter_by(employer_id=current_user.id).order_by(Vacancy.created_at.desc()).all()
+    vacancies = keyset_paginate(Vacancy.query.filter_by(employer_id=current_user.id), Vacancy,
+                                cursor=request.args.get('cursor'),
+                                per_page=current_app.config['VACANCIES_PER_PAGE'])
     return render_template('my_vacancies.html', vacancies=vacancies)
 
 
@@ -166,6 +184,8 @@ def create():
             db.session.commit()
 
             flash('Вакансия успешно создана!', 'success')
+            if DuplicateService.duplicate_of('vacancy', vacancy.id):
+                flash('На платформе уже есть почти такая же вакансия', 'warning')
             return redirect(url_for('vacancy.my_vacancies'))
 
         except Exception as e:
@@ -202,6 +222,8 @@ def edit(vacancy_id):
         try:
             db.session.commit()
             flash('Вакансия успешно обновлена!', 'success')
+            if DuplicateService.duplicate_of('vacancy', vacancy.id):
+                flash('На платформе уже есть почти такая же вакансия', 'warning')
             return redirect(url_for('vacancy.my_vacancies'))
         except Exception as e:
             db.session.rollback()
@@ -240,6 +262,8 @@ def close(vacancy_id):
         flash('У вас нет прав для закрытия этой вакансии', 'error')
         return redirect(url_for('vacancy.my_vacancies'))
 
+    if vacancy.status != 'closed':
+        NotificationService.notify_vacancy_closed(vacancy)
     vacancy.close()
     flash('Вакансия закрыта!', 'success')
     return redirect(url_for('vacancy.my_vacancies'))
@@ -281,7 +305,15 @@ def applications(vacancy_id):
         flash('У вас нет прав для просмотра откликов', 'error')
         return redirect(url_for('vacancy.my_vacancies'))
 
-    applications = Application.query.filter_by(vacancy_id=vacancy_id).order_by(Application.created_at.desc()).all()
+    # соискатели и их резюме для всей страницы - двумя запросами IN (...), а не по запросу на отклик
+    query = Application.query.filter_by(vacancy_id=vacancy_id).options(
+        selectinload(Application.applicant).selectinload(Applicant.resume_list).load_only(
+            Resume.id, Resume.applicant_id
+        )
+    )
+    applications = keyset_paginate(query, Application,
+                                   cursor=request.args.get('cursor'),
+                                   per_page=current_app.config['APPLICATIONS_PER_PAGE'])
     return render_template('applications.html', vacancy=vacancy, applications=applications)
 
 
@@ -299,9 +331,10 @@ def update_application_status(application_id):
 
     new_status = request.form.get('status')
 
-    if application.update_status(new_status):
-        # Отправляем уведомление соискателю
+    if application.update_status(new_status, commit=False):
+        # Отправляем уведомление соискателю - одним коммитом со статусом
         NotificationService.notify_status_change(application)
+        db.session.commit()
         flash('Статус отклика обновлен!', 'success')
     else:
         flash('Недопустимый статус', 'error')
@@ -20,12 +20,116 @@ def init_db(app):
         from models.resume import Resume
         from models.vacancy import Vacancy
         from models.application import Application
-        from models.notification import Notification
+        from models.notification import Notification, NotificationOutbox, NotificationArchive
+        from models.skill import Skill
+        from models.recommendation import Recommendation
+        from models.content_signature import ContentSignature
+        from models.statistics import PlatformStat
 
+        register_sql_functions(db.engine)
         db.create_all()
+        upgraded_tables = upgrade_schema()
+
+        from services.search_service import SearchService
+        SearchService.init_app(app)
+
+        from services.search_cache import VacancySearchCache
+        VacancySearchCache.init_app(app)
+
+        from services.autocomplete_service import AutocompleteService
+        AutocompleteService.init_app(app)
+
+        from services.matching_service import MatchingService
+        MatchingService.init_app(app)
+
+        from services.recommendation_service import RecommendationService
+        RecommendationService.init_app(app)
+
+        from services.duplicate_service import DuplicateService
+        DuplicateService.init_app(app)
+
+        from services.notification_service import NotificationService
+        NotificationService.init_app(app)
+
+        from services.user_cache import UserCache
+        UserCache.init_app(app)
+
+        from services.password_hasher import PasswordHasher
+        PasswordHasher.init_app(app)
+
+        from services.sql_profiler import SqlProfiler
+        SqlProfiler.init_app(app)
+
+        from services.request_metrics import RequestMetrics
+        RequestMetrics.init_app(app)
+
+        if Skill.query.first() is None:
+            # первый запуск после появления справочника навыков - заполняем его по существующим записям
+            Skill.backfill()
+        elif Skill.stale_ids():
+            # изменились правила канонических имён навыков - пересобираем справочник и токены навыков в поиске
+            Skill.backfill()
+            SearchService.rebuild('resumes')
+
+        if 'vacancies' in upgraded_tables:
+            # в существующей БД появились новые столбцы вакансий - заполняем их
+            Vacancy.reconcile_counters()
+            Vacancy.backfill_published_at()
+
+        if 'users' in upgraded_tables:
+            # в существующей БД появился счётчик непрочитанных уведомлений - заполняем его
+            NotificationService.reconcile_unread_counts()
+
+        from services.stats_service import StatsService
+        if PlatformStat.query.first() is None or 'vacancies' in upgraded_tables:
+            # первый запуск после появления статистики (или её новых рядов) - считаем по существующим записям
+            StatsService.rebuild()
+
         create_test_data()
 
 
+def register_sql_functions(engine):
+    """
+    Функции SQL для соединений SQLite:
+    normalize_text(x) - приведение регистра с учётом Unicode и ё→е (lower() и LIKE в SQLite меняют регистр только у ASCII)
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    from sqlalchemy import event
+    from services.text_normalization import normalize_text
+
+    @event.listens_for(engine, 'connect')
+    def register(dbapi_connection, connection_record):
+        dbapi_connection.create_function('normalize_text', 1, normalize_text, deterministic=True)
+
+
+def upgrade_schema():
+    """
+    Досоздать столбцы и индексы, добавленные в модели после создания БД
+    (create_all() создаёт их только вместе с новыми таблицами)
+    Возвращает имена таблиц, в которые добавлены столбцы
+    """
+    from sqlalchemy import inspect
+    from sqlalchemy.schema import CreateColumn
+
+    upgraded_tables = set()
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {ddl}')
+                    upgraded_tables.add(table.name)
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    return upgraded_tables
+
+
 def create_test_data():
     from models.user import User, Applicant, Employer, Administrator
     from models.resume import Resume
@@ -2,7 +2,11 @@ from models.user import User, Applicant, Employer, Administrator
 from models.resume import Resume
 from models.vacancy import Vacancy
 from models.application import Application
-from models.notification import Notification
+from models.notification import Notification, NotificationOutbox, NotificationArchive
+from models.skill import Skill
+from models.recommendation import Recommendation
+from models.content_signature import ContentSignature
+from models.statistics import PlatformStat, DailyStat
 
 __all__ = [
     'User',
@@ -12,5 +16,12 @@ __all__ = [
     'Resume',
     'Vacancy',
     'Application',
-    'Notification'
+    'Notification',
+    'NotificationOutbox',
+    'NotificationArchive',
+    'Skill',
+    'Recommendation',
+    'ContentSignature',
+    'PlatformStat',
+    'DailyStat'
 ]
\ No newline at end of file
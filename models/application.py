@@ -10,8 +10,10 @@
 Методы:
 - обновитьСтатус(новыйСтатус : String)
 """
+from sqlalchemy import event, inspect
 from database import db
 from datetime import datetime
+from models.vacancy import Vacancy, APPLICATION_COUNTERS
 
 
 class Application(db.Model):
@@ -19,30 +21,73 @@ class Application(db.Model):
     Модель отклика соискателя на вакансию
     """
     __tablename__ = 'applications'
+    __table_args__ = (
+        db.Index('ix_applications_vacancy_created', 'vacancy_id', 'created_at', 'id'),
+        # счётчики откликов по статусам без чтения строк (панель работодателя)
+        db.Index('ix_applications_vacancy_status', 'vacancy_id', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
-    status = db.Column(db.String(20), default='pending')
+    # active_history - прежнее значение нужно событиям для пересчёта счётчиков вакансии, даже если объект был сброшен
+    status = db.column_property(db.Column(db.String(20), default='pending'), active_history=True)
 
     cover_letter = db.Column(db.Text)
 
     applicant_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    vacancy_id = db.Column(db.Integer, db.ForeignKey('vacancies.id'), nullable=False)
+    vacancy_id = db.column_property(db.Column(db.Integer, db.ForeignKey('vacancies.id'), nullable=False),
+                                    active_history=True)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    def update_status(self, new_status):
+    def update_status(self, new_status, commit=True):
         """
         Метод обновитьСтатус(новыйСтатус : String) из диаграммы классов
+        commit=False - изменение сохранится коммитом вызывающего кода (например, вместе с уведомлением)
         """
         valid_statuses = ['pending', 'accepted', 'rejected', 'invited']
         if new_status in valid_statuses:
             self.status = new_status
             self.updated_at = datetime.utcnow()
-            db.session.commit()
+            if commit:
+                db.session.commit()
             return True
         return False
 
     def __repr__(self):
         return f'<Application {self.id} - {self.status}>'
+
+
+def _adjust_counters(connection, vacancy_id, status, delta):
+    """Изменить счётчики откликов вакансии (атомарно, на соединении текущего flush)"""
+    table = Vacancy.__table__
+    values = {'applications_count': table.c.applications_count + delta}
+    if status in APPLICATION_COUNTERS:
+        column = APPLICATION_COUNTERS[status]
+        values[column] = table.c[column] + delta
+    # служебное обновление - не меняет дату изменения вакансии
+    values['updated_at'] = table.c.updated_at
+    connection.execute(db.update(table).where(table.c.id == vacancy_id).values(values))
+
+
+@event.listens_for(Application, 'after_insert')
+def _application_inserted(mapper, connection, target):
+    _adjust_counters(connection, target.vacancy_id, target.status or 'pending', 1)
+
+
+@event.listens_for(Application, 'after_delete')
+def _application_deleted(mapper, connection, target):
+    _adjust_counters(connection, target.vacancy_id, target.status, -1)
+
+
+@event.listens_for(Application, 'after_update')
+def _application_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    status, vacancy_id = attrs.status.history, attrs.vacancy_id.history
+    if not status.has_changes() and not vacancy_id.has_changes():
+        return
+    old_status = status.deleted[0] if status.deleted else target.status
+    old_vacancy_id = vacancy_id.deleted[0] if vacancy_id.deleted else target.vacancy_id
+    _adjust_counters(connection, old_vacancy_id, old_status, -1)
+    _adjust_counters(connection, target.vacancy_id, target.status, 1)
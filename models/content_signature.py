@@ -0,0 +1,42 @@
+"""
+Модель сигнатуры содержимого (поиск почти одинаковых вакансий и резюме)
+- content_signatures - MinHash-сигнатура текста записи и ссылка на запись, копией которой она считается
+- lsh_buckets - корзины LSH: сигнатура делится на полосы, запись попадает в корзину своей полосы.
+  Кандидаты в дубликаты - записи, совпавшие с новой хотя бы в одной корзине (выборка по индексу)
+"""
+from database import db
+from datetime import datetime
+
+
+lsh_buckets = db.Table(
+    'lsh_buckets',
+    db.Column('kind', db.String(20), primary_key=True),
+    db.Column('band', db.SmallInteger, primary_key=True),
+    db.Column('bucket', db.BigInteger, primary_key=True),
+    db.Column('object_id', db.Integer, primary_key=True),
+    db.Index('ix_lsh_buckets_object', 'kind', 'object_id')
+)
+
+
+class ContentSignature(db.Model):
+    """
+    Сигнатура вакансии (kind='vacancy') или резюме (kind='resume')
+    """
+    __tablename__ = 'content_signatures'
+    __table_args__ = (
+        db.Index('ix_content_signatures_duplicate', 'kind', 'duplicate_of'),
+    )
+
+    kind = db.Column(db.String(20), primary_key=True)
+    object_id = db.Column(db.Integer, primary_key=True)
+
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+    # запись того же вида, копией которой считается эта, и оценка их сходства (Жаккара)
+    duplicate_of = db.Column(db.Integer)
+    similarity = db.Column(db.Float)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ContentSignature {self.kind} {self.object_id}>'
@@ -1,16 +1,32 @@
 """
 Модель уведомлений
 Используется в последовательности из sequence диаграммы
+Счётчик непрочитанных у пользователя (users.unread_notifications_count) обновляется
+при добавлении, прочтении и удалении уведомлений в той же транзакции
+
+- notification_outbox - уведомления, которые ещё предстоит доставить: запрос сохраняет их
+  в своей транзакции, фоновый обработчик переносит пачками в notifications (services/notification_service.py)
+- notification_archive - прочитанные уведомления старше срока хранения, перенесённые из notifications
 """
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
 from database import db
 from datetime import datetime
 
+# id пользователей, у которых в текущей транзакции менялись уведомления (для кэша NotificationService)
+CHANGED_KEY = 'notifications_changed'
+
 
 class Notification(db.Model):
     """
     Модель уведомлений для пользователей
     """
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # непрочитанные пользователя (шапка, отметить все прочитанными) и список уведомлений по дате
+        db.Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_notifications_user_created', 'user_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -24,7 +40,8 @@ class Notification(db.Model):
     related_id = db.Column(db.Integer)
     related_type = db.Column(db.String(50))
 
-    is_read = db.Column(db.Boolean, default=False)
+    # active_history - прежнее значение нужно для счётчика непрочитанных, даже если объект был сброшен
+    is_read = db.column_property(db.Column(db.Boolean, default=False), active_history=True)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -36,4 +53,102 @@ class Notification(db.Model):
         db.session.commit()
 
     def __repr__(self):
-        return f'<Notification {self.title}>'
\ No newline at end of file
+        return f'<Notification {self.title}>'
+
+
+class NotificationOutbox(db.Model):
+    """
+    Уведомление, ожидающее доставки
+    """
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    notification_type = db.Column(db.String(50), nullable=False)
+
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+
+    related_id = db.Column(db.Integer)
+    related_type = db.Column(db.String(50))
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.id} -> {self.user_id}>'
+
+
+class NotificationArchive(db.Model):
+    """
+    Архив прочитанных уведомлений
+    """
+    __tablename__ = 'notification_archive'
+
+    # id исходного уведомления
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+
+    notification_type = db.Column(db.String(50), nullable=False)
+
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+
+    related_id = db.Column(db.Integer)
+    related_type = db.Column(db.String(50))
+
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<NotificationArchive {self.id} -> {self.user_id}>'
+
+
+def adjust_unread_count(connection, user_id, delta):
+    """Изменить счётчик непрочитанных уведомлений пользователя (атомарно, на соединении текущего flush)"""
+    from models.user import User
+    table = User.__table__
+    connection.execute(
+        db.update(table).where(table.c.id == user_id)
+        .values(unread_notifications_count=table.c.unread_notifications_count + delta)
+    )
+
+
+def adjust_unread_counts(connection, user_ids, delta):
+    """Изменить счётчики непрочитанных уведомлений нескольких пользователей на одно и то же значение одним UPDATE"""
+    from models.user import User
+    table = User.__table__
+    connection.execute(
+        db.update(table).where(table.c.id.in_(user_ids))
+        .values(unread_notifications_count=table.c.unread_notifications_count + delta)
+    )
+
+
+def _changed(target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(CHANGED_KEY, set()).add(target.user_id)
+
+
+@event.listens_for(Notification, 'after_insert')
+def _notification_inserted(mapper, connection, target):
+    if not target.is_read:
+        adjust_unread_count(connection, target.user_id, 1)
+    _changed(target)
+
+
+@event.listens_for(Notification, 'after_update')
+def _notification_updated(mapper, connection, target):
+    history = inspect(target).attrs.is_read.history
+    if history.has_changes() and bool(history.deleted and history.deleted[0]) != bool(target.is_read):
+        adjust_unread_count(connection, target.user_id, -1 if target.is_read else 1)
+        _changed(target)
+
+
+@event.listens_for(Notification, 'after_delete')
+def _notification_deleted(mapper, connection, target):
+    if not target.is_read:
+        adjust_unread_count(connection, target.user_id, -1)
+    _changed(target)
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+Модель рекомендаций вакансий
+Одна строка на соискателя: заранее посчитанный список лучших для него опубликованных вакансий.
+Строка помечается устаревшей (stale) при изменении резюме соискателя, его отклике
+или публикации похожей вакансии и пересчитывается фоновым потоком (services/recommendation_service.py)
+"""
+from database import db
+from datetime import datetime
+
+
+class Recommendation(db.Model):
+    """
+    Рекомендованные вакансии соискателя
+    """
+    __tablename__ = 'vacancy_recommendations'
+
+    applicant_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+
+    # id вакансий через запятую в порядке убывания близости
+    vacancy_ids = db.Column(db.Text, nullable=False, default='')
+
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def get_vacancy_ids(self):
+        """Получить список id рекомендованных вакансий"""
+        if self.vacancy_ids:
+            return [int(vacancy_id) for vacancy_id in self.vacancy_ids.split(',')]
+        return []
+
+    def __repr__(self):
+        return f'<Recommendation {self.applicant_id}>'
@@ -20,6 +20,9 @@ class Resume(db.Model):
     Модель резюме соискателя
     """
     __tablename__ = 'resumes'
+    __table_args__ = (
+        db.Index('ix_resumes_created', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -30,6 +33,9 @@ class Resume(db.Model):
 
     applicant_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
+    # навыки из справочника (models/skill.py), синхронизируются с полем skills при записи
+    skill_items = db.relationship('Skill', secondary='resume_skills', lazy='select')
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
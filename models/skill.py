@@ -0,0 +1,185 @@
+"""
+Модель навыка (справочник навыков)
+Навыки резюме (Resume.skills) и требования вакансий (Vacancy.requirements) вводятся свободным текстом
+через запятую. Для поиска они дополнительно раскладываются в справочник skills и таблицы связей
+resume_skills / vacancy_skills, которые обновляются при каждой записи резюме или вакансии.
+Поиск "все резюме с навыком X" - выборка по индексу, а не сканирование текста
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import db
+
+# синонимы навыков -> каноническое имя
+SKILL_ALIASES = {
+    'js': 'javascript',
+    'ts': 'typescript',
+    'golang': 'go',
+    'k8s': 'kubernetes',
+    'postgres': 'postgresql',
+    'psql': 'postgresql',
+    'reactjs': 'react',
+    'react_js': 'react',
+    'vuejs': 'vue',
+    'vue_js': 'vue',
+    'nodejs': 'node_js',
+    'py': 'python',
+    'python3': 'python',
+}
+
+resume_skills = db.Table(
+    'resume_skills',
+    db.Column('resume_id', db.Integer, db.ForeignKey('resumes.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('skill_id', db.Integer, db.ForeignKey('skills.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_resume_skills_skill', 'skill_id', 'resume_id')
+)
+
+vacancy_skills = db.Table(
+    'vacancy_skills',
+    db.Column('vacancy_id', db.Integer, db.ForeignKey('vacancies.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('skill_id', db.Integer, db.ForeignKey('skills.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_vacancy_skills_skill', 'skill_id', 'vacancy_id')
+)
+
+
+class Skill(db.Model):
+    """
+    Навык из справочника
+    - name - каноническое имя ("Django/Flask" -> "django_flask", "JS" -> "javascript", "Flutter 3+" -> "flutter",
+      "C++" -> "cpp", "C#" -> "csharp")
+    - display_name - написание, в котором навык встретился впервые
+    """
+    __tablename__ = 'skills'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), unique=True, nullable=False, index=True)
+    display_name = db.Column(db.String(200), nullable=False)
+
+    @staticmethod
+    def canonical_name(raw_skill):
+        """Каноническое имя навыка: номер версии отбрасывается ("Python 3.11+" -> "python")"""
+        from services.text_normalization import skill_words
+        words = skill_words(raw_skill)
+        while len(words) > 1 and words[-1].isdigit():
+            words.pop()
+        token = '_'.join(words)[:200]
+        return SKILL_ALIASES.get(token, token)
+
+    @classmethod
+    def resolve(cls, raw_skills, session=None, pending=None):
+        """
+        Найти или создать навыки справочника для списка навыков в свободной форме
+        pending - ещё не сохранённые навыки этой транзакции по имени (пополняется созданными)
+        """
+        session = session or db.session
+        names = {}
+        for raw_skill in raw_skills:
+            name = cls.canonical_name(raw_skill)
+            if name and name not in names:
+                names[name] = raw_skill.strip()[:200]
+        if not names:
+            return []
+
+        with session.no_autoflush:
+            # навыки, созданные для других записей в этой же транзакции, ещё не сохранены в БД
+            if pending is None:
+                pending = {obj.name: obj for obj in session.new if isinstance(obj, cls)}
+            existing = {name: pending[name] for name in names if name in pending}
+            for skill in session.query(cls).filter(cls.name.in_(names)):
+                existing.setdefault(skill.name, skill)
+            for name, display_name in names.items():
+                if name not in existing:
+                    existing[name] = pending[name] = cls(name=name, display_name=display_name)
+                    session.add(existing[name])
+        return [existing[name] for name in names]
+
+    @classmethod
+    def resumes_with(cls, raw_skills, match_all=True):
+        """Запрос резюме, у которых есть все (match_all) или хотя бы один из навыков"""
+        from models.resume import Resume
+        return Resume.query.filter(Resume.id.in_(cls.owner_ids(resume_skills.c.resume_id, raw_skills, match_all)))
+
+    @classmethod
+    def vacancies_with(cls, raw_skills, match_all=True):
+        """Запрос вакансий, требующих все (match_all) или хотя бы один из навыков"""
+        from models.vacancy import Vacancy
+        return Vacancy.query.filter(Vacancy.id.in_(cls.owner_ids(vacancy_skills.c.vacancy_id, raw_skills, match_all)))
+
+    @classmethod
+    def owner_ids(cls, owner_column, raw_skills, match_all=True):
+        """
+        Подзапрос id резюме/вакансий по столбцу таблицы связей (resume_skills.c.resume_id и т.п.)
+        Выполняется по индексам skills.name и (skill_id, ...) таблицы связей
+        """
+        names = {cls.canonical_name(raw_skill) for raw_skill in raw_skills}
+        names.discard('')
+
+        link_table = owner_column.table
+        query = db.select(owner_column).join(cls, cls.id == link_table.c.skill_id).where(cls.name.in_(names))
+        if match_all and len(names) > 1:
+            query = query.group_by(owner_column).having(db.func.count() == len(names))
+        return query
+
+    @classmethod
+    def stale_ids(cls):
+        """
+        id навыков, имя которых не совпадает с текущим каноническим именем их написания
+        (справочник заполнен прежними правилами - например, "C++" и "C#" были слиты в "c")
+        """
+        return [skill_id for skill_id, name, display_name in db.session.query(cls.id, cls.name, cls.display_name)
+                if cls.canonical_name(display_name) != name]
+
+    @classmethod
+    def backfill(cls, batch_size=500):
+        """
+        Заполнить таблицы связей для уже существующих резюме и вакансий
+        Навыки, построенные прежними правилами, удаляются и создаются заново
+        Возвращает количество обработанных записей
+        """
+        from models.resume import Resume
+        from models.vacancy import Vacancy
+
+        stale_ids = cls.stale_ids()
+        if stale_ids:
+            for link_table in (resume_skills, vacancy_skills):
+                db.session.execute(link_table.delete().where(link_table.c.skill_id.in_(stale_ids)))
+            cls.query.filter(cls.id.in_(stale_ids)).delete()
+            db.session.commit()
+
+        processed = 0
+        for model, attribute, skills_list in ((Resume, 'skill_items', 'get_skills_list'),
+                                              (Vacancy, 'requirement_items', 'get_requirements_list')):
+            last_id = 0
+            while True:
+                batch = model.query.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+                if not batch:
+                    break
+                for obj in batch:
+                    setattr(obj, attribute, cls.resolve(getattr(obj, skills_list)()))
+                db.session.commit()
+                processed += len(batch)
+                last_id = batch[-1].id
+        return processed
+
+    def __repr__(self):
+        return f'<Skill {self.name}>'
+
+
+@event.listens_for(Session, 'before_flush')
+def _sync_skill_links(session, flush_context, instances):
+    """Обновить связи с навыками у новых и изменённых резюме и вакансий"""
+    from models.resume import Resume
+    from models.vacancy import Vacancy
+
+    new = list(session.new)
+    new_ids = {id(obj) for obj in new}
+    pending = {obj.name: obj for obj in new if isinstance(obj, Skill)}
+    for obj in new + list(session.dirty):
+        if isinstance(obj, Resume):
+            attribute, column, raw = 'skill_items', 'skills', obj.get_skills_list
+        elif isinstance(obj, Vacancy):
+            attribute, column, raw = 'requirement_items', 'requirements', obj.get_requirements_list
+        else:
+            continue
+
+        if id(obj) in new_ids or db.inspect(obj).attrs[column].history.has_changes():
+            setattr(obj, attribute, Skill.resolve(raw(), session, pending))
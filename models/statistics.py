@@ -0,0 +1,35 @@
+"""
+Модели статистики платформы (services/stats_service.py)
+- platform_stats - текущие итоги по метрикам: пользователи, резюме, вакансии, отклики (всего и по ролям/статусам)
+- daily_stats - сводка по дням: сколько записей создано в этот день (существующих сейчас)
+Обе таблицы обновляются вместе с изменением самих записей, отчёты администратора читают только их
+"""
+from database import db
+
+
+class PlatformStat(db.Model):
+    """
+    Итог по метрике, например 'users', 'users:employer', 'vacancies:published'
+    """
+    __tablename__ = 'platform_stats'
+
+    metric = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PlatformStat {self.metric}={self.value}>'
+
+
+class DailyStat(db.Model):
+    """
+    Значение метрики за день (дата по UTC)
+    """
+    __tablename__ = 'daily_stats'
+
+    # ключ (metric, day) - ряд одной метрики за период читается по первичному ключу
+    metric = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyStat {self.day} {self.metric}={self.value}>'
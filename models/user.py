@@ -8,7 +8,6 @@
 """
 from database import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 
@@ -31,25 +30,36 @@ class User(UserMixin, db.Model):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password = db.Column(db.String(255), nullable=False)
-    role = db.Column(db.String(20), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    is_blocked = db.Column(db.Boolean, default=False)
+    # active_history - прежние значения нужны событиям статистики (services/stats_service.py)
+    role = db.column_property(db.Column(db.String(20), nullable=False), active_history=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    is_blocked = db.column_property(db.Column(db.Boolean, default=False), active_history=True)
 
     type = db.Column(db.String(50))
 
+    # число непрочитанных уведомлений, обновляется в той же транзакции, что и уведомления (models/notification.py)
+    unread_notifications_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     __mapper_args__ = {
         'polymorphic_identity': 'user',
         'polymorphic_on': type
     }
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        from services.password_hasher import PasswordHasher
+        self.password = PasswordHasher.hash(password)
 
     def check_password(self, password):
         """
         Метод войти() из диаграммы классов
+        Хэш проверяется в пуле процессов (services/password_hasher.py); если он получен с устаревшими
+        параметрами, в пользователя записывается новый хэш (сохраняется коммитом вызывающего кода)
         """
-        return check_password_hash(self.password, password)
+        from services.password_hasher import PasswordHasher
+        valid, new_hash = PasswordHasher.verify(self.password, password)
+        if new_hash:
+            self.password = new_hash
+        return valid
 
     def __repr__(self):
         return f'<User {self.email}>'
@@ -63,6 +73,7 @@ class Applicant(User):
     Методы:
     - создатьРезюме()
     - откликнуться(вакансия)
+    - Основное резюме()(ДОБАВИЛ)
     """
     __mapper_args__ = {
         'polymorphic_identity': 'applicant'
@@ -76,6 +87,18 @@ class Applicant(User):
                                    foreign_keys='Application.applicant_id',
                                    cascade='all, delete-orphan')
 
+    # те же резюме обычным списком (в порядке создания) - чтобы списки откликов могли
+    # загрузить резюме всех соискателей страницы одним запросом (selectinload)
+    resume_list = db.relationship('Resume', foreign_keys='Resume.applicant_id', order_by='Resume.id',
+                                  viewonly=True)
+
+    @property
+    def primary_resume(self):
+        """
+        Основное резюме соискателя - первое созданное
+        """
+        return self.resume_list[0] if self.resume_list else None
+
     def create_resume(self, title, experience, skills, education):
         """
         Метод создатьРезюме() из диаграммы классов
@@ -124,6 +147,7 @@ class Employer(User):
     Методы:
     - создатьВакансию()
     - просмотретьОтклики()
+    - Получить сводку для панели работодателя()(ДОБАВИЛ)
     """
     company_name = db.Column(db.String(200))
     company_description = db.Column(db.Text)
@@ -158,9 +182,29 @@ class Employer(User):
         Метод просмотретьОтклики() из диаграммы классов
         """
         from models.application import Application
-        return Application.query.join(Application.vacancy).filter(
-            Application.vacancy.has(employer_id=self.id)
-        ).all()
+        from models.vacancy import Vacancy
+        return Application.query.join(Application.vacancy).filter(Vacancy.employer_id == self.id).all()
+
+    def get_dashboard_stats(self):
+        """
+        Получить сводку для панели работодателя
+        Все счётчики одним агрегирующим запросом по вакансиям работодателя (счётчики откликов хранятся в вакансиях)
+        """
+        from models.vacancy import Vacancy
+        row = db.session.execute(
+            db.select(
+                db.func.count(Vacancy.id),
+                db.func.count(db.case((Vacancy.status == 'published', Vacancy.id))),
+                db.func.coalesce(db.func.sum(Vacancy.applications_count), 0),
+                db.func.coalesce(db.func.sum(Vacancy.pending_count), 0)
+            ).where(Vacancy.employer_id == self.id)
+        ).one()
+        return {
+            'vacancies_count': row[0],
+            'published_count': row[1],
+            'applications_count': row[2],
+            'pending_count': row[3]
+        }
 
 
 class Administrator(User):
@@ -168,7 +212,7 @@ class Administrator(User):
     Администратор (наследник User)
     Методы:
     - модерироватьПользователя(пользователь)
-    - просмотретьОтчёты()
+    - просмотретьОтчёты()(итоги берутся из статистики платформы, services/stats_service.py)
     """
     __mapper_args__ = {
         'polymorphic_identity': 'administrator'
@@ -185,17 +229,5 @@ class Administrator(User):
         """
         Метод просмотретьОтчёты() из диаграммы классов
         """
-        from models.application import Application
-        from models.vacancy import Vacancy
-        from models.resume import Resume
-
-        report = {
-            'total_users': User.query.count(),
-            'total_applicants': Applicant.query.count(),
-            'total_employers': Employer.query.count(),
-            'total_resumes': Resume.query.count(),
-            'total_vacancies': Vacancy.query.count(),
-            'total_applications': Application.query.count(),
-            'blocked_users': User.query.filter_by(is_blocked=True).count()
-        }
-        return report
+        from services.stats_service import StatsService
+        return StatsService.basic_report()
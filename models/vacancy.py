@@ -11,16 +11,33 @@
 - опубликовать()
 - закрыть()
 - Получить список требований()(ДОБАВИЛ)
+- Пересчитать счётчики откликов()(ДОБАВИЛ)
+- Заполнить дату публикации()(ДОБАВИЛ)
 """
+from collections import Counter, defaultdict
+from sqlalchemy import event
 from database import db
 from datetime import datetime
 
+# статус отклика -> столбец вакансии со счётчиком откликов в этом статусе
+APPLICATION_COUNTERS = {
+    'pending': 'pending_count',
+    'invited': 'invited_count',
+    'accepted': 'accepted_count',
+    'rejected': 'rejected_count'
+}
+
 
 class Vacancy(db.Model):
     """
     Модель вакансии работодателя
     """
     __tablename__ = 'vacancies'
+    __table_args__ = (
+        # индексы под курсорную пагинацию по (created_at, id)
+        db.Index('ix_vacancies_status_created', 'status', 'created_at', 'id'),
+        db.Index('ix_vacancies_employer_created', 'employer_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -29,15 +46,28 @@ class Vacancy(db.Model):
     salary = db.Column(db.String(100))
     location = db.Column(db.String(200))
 
-    status = db.Column(db.String(20), default='draft')
+    # active_history - прежний статус нужен событиям статистики (services/stats_service.py), даже если объект был сброшен
+    status = db.column_property(db.Column(db.String(20), default='draft'), active_history=True)
 
     employer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     applications = db.relationship('Application', backref='vacancy', lazy='dynamic',
                                    cascade='all, delete-orphan')
 
+    # счётчики откликов, обновляются в той же транзакции, что и отклики (models/application.py)
+    applications_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pending_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    invited_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    accepted_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rejected_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # требования из справочника навыков (models/skill.py), синхронизируются с полем requirements при записи
+    requirement_items = db.relationship('Skill', secondary='vacancy_skills', lazy='select')
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # дата первой публикации, проставляется при переходе в статус published
+    published_at = db.Column(db.DateTime)
 
     def publish(self):
         """
@@ -59,5 +89,67 @@ class Vacancy(db.Model):
             return [r.strip() for r in self.requirements.split(',')]
         return []
 
+    @classmethod
+    def reconcile_counters(cls, batch_size=1000):
+        """
+        Пересчитать счётчики откликов по таблице откликов
+        Возвращает количество вакансий, у которых счётчики расходились
+        """
+        from models.application import Application
+
+        columns = ['applications_count'] + list(APPLICATION_COUNTERS.values())
+        table = cls.__table__
+        repaired = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                db.select(table.c.id, *(table.c[column] for column in columns))
+                .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            actual = defaultdict(Counter)
+            for vacancy_id, status, count in db.session.execute(
+                    db.select(Application.vacancy_id, Application.status, db.func.count())
+                    .where(Application.vacancy_id.between(rows[0].id, rows[-1].id))
+                    .group_by(Application.vacancy_id, Application.status)):
+                actual[vacancy_id]['applications_count'] += count
+                if status in APPLICATION_COUNTERS:
+                    actual[vacancy_id][APPLICATION_COUNTERS[status]] += count
+
+            for row in rows:
+                values = {column: actual[row.id][column] for column in columns}
+                if any(getattr(row, column) != value for column, value in values.items()):
+                    db.session.execute(
+                        db.update(table).where(table.c.id == row.id)
+                        .values(updated_at=table.c.updated_at, **values)
+                    )
+                    repaired += 1
+            db.session.commit()
+            last_id = rows[-1].id
+        return repaired
+
+    @classmethod
+    def backfill_published_at(cls):
+        """
+        Заполнить дату публикации у вакансий, опубликованных до появления столбца
+        (точная дата не хранилась - берём дату последнего изменения)
+        """
+        table = cls.__table__
+        result = db.session.execute(
+            db.update(table)
+            .where(table.c.published_at.is_(None), table.c.status.in_(['published', 'closed']))
+            .values(published_at=table.c.updated_at, updated_at=table.c.updated_at)
+        )
+        db.session.commit()
+        return result.rowcount
+
     def __repr__(self):
         return f'<Vacancy {self.title}>'
+
+
+@event.listens_for(Vacancy.status, 'set')
+def _status_set(target, value, oldvalue, initiator):
+    if value == 'published' and target.published_at is None:
+        target.published_at = datetime.utcnow()
@@ -1,3 +1,6 @@
 from services.notification_service import NotificationService
+from services.search_service import SearchService
+from services.search_cache import VacancySearchCache
+from services.autocomplete_service import AutocompleteService
 
-__all__ = ['NotificationService']
\ No newline at end of file
+__all__ = ['NotificationService', 'SearchService', 'VacancySearchCache', 'AutocompleteService']
\ No newline at end of file
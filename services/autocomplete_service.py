@@ -0,0 +1,291 @@
+"""
+Сервис подсказок для строки поиска (автодополнение)
+Префиксный индекс в памяти по отсортированному массиву:
+- vacancies - названия опубликованных вакансий и требования (Vacancy.get_requirements_list())
+- skills - навыки из резюме (Resume.get_skills_list())
+Подсказки ранжируются по частоте по всем терминам с этим началом; для коротких префиксов (1-2 символа)
+лучшие термины посчитаны заранее. Индекс строится в фоновом потоке (пока он не построен, подсказок нет),
+затем обновляется после каждого коммита, изменившего вакансии или резюме, и полностью перестраивается
+в фоне раз в AUTOCOMPLETE_REBUILD_INTERVAL секунд (чтобы подхватить изменения из других процессов)
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, load_only, object_session
+from models.resume import Resume
+from models.vacancy import Vacancy
+from services.text_normalization import normalize_text
+
+PENDING_KEY = 'autocomplete_pending'
+
+# сколько лучших терминов хранится для каждого короткого префикса (наибольший limit запроса подсказок)
+TOP_SIZE = 20
+
+
+def term_key(term):
+    return ' '.join(normalize_text(term).split())
+
+
+class PrefixIndex:
+    """
+    Префиксный индекс терминов с частотами
+    Каждый термин доступен по началу любого своего слова: "back" и "dev" находят "Backend Developer"
+    """
+
+    # для префиксов не длиннее этого (самых дорогих) лучшие термины хранятся готовыми
+    top_prefix_length = 2
+
+    def __init__(self, terms=()):
+        self.counts = {}
+        self.display = {}
+        for term in terms:
+            key = term_key(term)
+            if key:
+                if key not in self.counts:
+                    self.counts[key] = 0
+                    self.display[key] = term.strip()
+                self.counts[key] += 1
+
+        # массив сортируется один раз, а не вставкой каждого термина
+        self.entries = sorted((variant, key) for key in self.counts for variant in self._variants(key))
+
+        # короткий префикс -> лучшие термины (TOP_SIZE) в порядке ранга
+        self._top = {}
+        for length in range(1, self.top_prefix_length + 1):
+            for prefix in {variant[:length] for variant, _ in self.entries if len(variant) >= length}:
+                self._top[prefix] = self._rank(prefix, TOP_SIZE)
+
+    @staticmethod
+    def _variants(key):
+        words = key.split(' ')
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def _short_prefixes(self, key):
+        return {variant[:length] for variant in self._variants(key)
+                for length in range(1, min(len(variant), self.top_prefix_length) + 1)}
+
+    def _order(self, key):
+        """Ранг: чаще, затем короче, затем по алфавиту - порядок одинаков при каждом запросе"""
+        return -self.counts[key], len(key), key
+
+    def _rank(self, prefix, limit):
+        """Лучшие термины среди всех с этим началом"""
+        start = bisect_left(self.entries, (prefix,))
+        end = bisect_left(self.entries, (prefix + '\uffff',), lo=start)
+        found = {key for _, key in self.entries[start:end]}
+        return heapq.nsmallest(limit, found, key=self._order)
+
+    def add(self, term):
+        key = term_key(term)
+        if not key:
+            return
+        if key not in self.counts:
+            self.counts[key] = 0
+            self.display[key] = term.strip()
+            for variant in self._variants(key):
+                insort(self.entries, (variant, key))
+        self.counts[key] += 1
+
+        # частота выросла - термин мог войти в лучшие
+        for prefix in self._short_prefixes(key):
+            top = self._top.get(prefix)
+            if top is not None and (key in top or len(top) < TOP_SIZE
+                                    or self._order(key) < self._order(top[-1])):
+                self._top[prefix] = sorted(set(top) | {key}, key=self._order)[:TOP_SIZE]
+
+    def remove(self, term):
+        key = term_key(term)
+        if key not in self.counts:
+            return
+        # частота упала - на место термина может встать любой другой, список пересчитывается при запросе
+        for prefix in self._short_prefixes(key):
+            top = self._top.get(prefix)
+            if top is not None and key in top:
+                del self._top[prefix]
+
+        self.counts[key] -= 1
+        if self.counts[key] > 0:
+            return
+        del self.counts[key]
+        del self.display[key]
+        for variant in self._variants(key):
+            position = bisect_left(self.entries, (variant, key))
+            if position < len(self.entries) and self.entries[position] == (variant, key):
+                del self.entries[position]
+
+    def complete(self, prefix, limit=10):
+        prefix = term_key(prefix)
+        if not prefix:
+            return []
+
+        if len(prefix) <= self.top_prefix_length and limit <= TOP_SIZE:
+            top = self._top.get(prefix)
+            if top is None:
+                top = self._top[prefix] = self._rank(prefix, TOP_SIZE)
+            best = top[:limit]
+        else:
+            best = self._rank(prefix, limit)
+        return [{'term': self.display[key], 'count': self.counts[key]} for key in best]
+
+
+class AutocompleteService:
+    """
+    Методы:
+    - Подсказки по началу запроса
+    - Учесть изменения вакансий и резюме после коммита
+    - Перестроить индекс
+    """
+    sources = ('vacancies', 'skills')
+
+    indexes = {}
+    # термины, внесённые каждой записью: {(источник, id): [термины]}
+    contributed = {}
+    built_at = None
+    rebuild_interval = 300
+
+    # изменения, пришедшие во время перестроения (применяются к новому индексу); None - перестроения нет
+    _rebuilding = None
+    _lock = threading.RLock()
+
+    @classmethod
+    def init_app(cls, app):
+        cls.rebuild_interval = app.config.get('AUTOCOMPLETE_REBUILD_INTERVAL', 300)
+        with cls._lock:
+            cls.indexes = {}
+            cls.contributed = {}
+            cls.built_at = None
+
+    @staticmethod
+    def vacancy_terms(vacancy):
+        if vacancy.status != 'published':
+            return []
+        return [vacancy.title] + vacancy.get_requirements_list()
+
+    @staticmethod
+    def resume_terms(resume):
+        return resume.get_skills_list()
+
+    @classmethod
+    def rebuild(cls):
+        with cls._lock:
+            if cls._rebuilding is None:
+                cls._rebuilding = []
+
+        try:
+            contributed = {}
+            vacancies = Vacancy.query.options(
+                load_only(Vacancy.title, Vacancy.requirements, Vacancy.status)
+            ).filter_by(status='published').yield_per(1000)
+            for vacancy in vacancies:
+                contributed[('vacancies', vacancy.id)] = cls.vacancy_terms(vacancy)
+
+            for resume in Resume.query.options(load_only(Resume.skills)).yield_per(1000):
+                contributed[('skills', resume.id)] = cls.resume_terms(resume)
+
+            indexes = {
+                source: PrefixIndex(term for (term_source, _), terms in contributed.items()
+                                    if term_source == source for term in terms)
+                for source in cls.sources
+            }
+        except Exception:
+            with cls._lock:
+                cls._rebuilding = None
+            raise
+
+        with cls._lock:
+            changes, cls._rebuilding = cls._rebuilding, None
+            cls.indexes = indexes
+            cls.contributed = contributed
+            cls.built_at = time.monotonic()
+            cls._apply(changes)
+
+    @classmethod
+    def _rebuild_in_background(cls, app):
+        with app.app_context():
+            try:
+                cls.rebuild()
+            except Exception as e:
+                print(f"Autocomplete rebuild error: {e}")
+
+    @classmethod
+    def _ensure_fresh(cls):
+        """Запустить перестроение в фоне, если индекса нет или он устарел (одно на процесс)"""
+        if cls.built_at is not None and time.monotonic() - cls.built_at <= cls.rebuild_interval:
+            return
+        with cls._lock:
+            if cls._rebuilding is not None:
+                return
+            cls._rebuilding = []
+        threading.Thread(target=cls._rebuild_in_background,
+                         args=(current_app._get_current_object(),), daemon=True).start()
+
+    @classmethod
+    def suggest(cls, source, prefix, limit=10):
+        """Подсказки для источника 'vacancies' или 'skills' (пустой список, пока индекс строится)"""
+        cls._ensure_fresh()
+        with cls._lock:
+            index = cls.indexes.get(source)
+            return index.complete(prefix, limit) if index is not None else []
+
+    @classmethod
+    def apply(cls, changes):
+        """Обновить индекс: changes - список (источник, id, новые термины)"""
+        with cls._lock:
+            if cls._rebuilding is not None:
+                cls._rebuilding.extend(changes)
+            if cls.built_at is not None:
+                cls._apply(changes)
+
+    @classmethod
+    def _apply(cls, changes):
+        for source, obj_id, terms in changes:
+            index = cls.indexes[source]
+            for term in cls.contributed.pop((source, obj_id), []):
+                index.remove(term)
+            if terms:
+                cls.contributed[(source, obj_id)] = terms
+                for term in terms:
+                    index.add(term)
+
+
+def _queue(target, source, terms):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(PENDING_KEY, []).append((source, target.id, terms))
+
+
+@event.listens_for(Vacancy, 'after_insert')
+@event.listens_for(Vacancy, 'after_update')
+def _vacancy_changed(mapper, connection, target):
+    _queue(target, 'vacancies', AutocompleteService.vacancy_terms(target))
+
+
+@event.listens_for(Resume, 'after_insert')
+@event.listens_for(Resume, 'after_update')
+def _resume_changed(mapper, connection, target):
+    _queue(target, 'skills', AutocompleteService.resume_terms(target))
+
+
+@event.listens_for(Vacancy, 'after_delete')
+def _vacancy_deleted(mapper, connection, target):
+    _queue(target, 'vacancies', [])
+
+
+@event.listens_for(Resume, 'after_delete')
+def _resume_deleted(mapper, connection, target):
+    _queue(target, 'skills', [])
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_after_commit(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    if changes:
+        AutocompleteService.apply(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,308 @@
+"""
+Сервис поиска почти одинаковых вакансий и резюме (MinHash + LSH)
+- текст записи (вакансия: описание и требования, резюме: опыт и навыки) разбивается на шинглы -
+  тройки подряд идущих нормализованных слов
+- MinHash-сигнатура из NUM_PERM минимумов хэшей шинглов оценивает сходство Жаккара двух текстов
+  долей совпавших позиций
+- сигнатура делится на BANDS полос по ROWS значений, хэш каждой полосы - корзина LSH (таблица lsh_buckets).
+  Записи со сходством выше порога почти наверняка совпадут хотя бы в одной корзине
+
+При создании и изменении записи кандидаты берутся из её корзин (выборка по индексу, без перебора всех записей),
+проверяются по сигнатурам, и запись помечается копией самой похожей (content_signatures.duplicate_of).
+Пакетная задача cluster() группирует уже существующие дубликаты по общим корзинам
+"""
+import zlib
+from hashlib import blake2b
+import numpy as np
+from sqlalchemy import and_, bindparam, delete, desc, event, exists, func, inspect, insert, select, union, update
+from database import db
+from models.resume import Resume
+from models.vacancy import Vacancy
+from models.content_signature import ContentSignature, lsh_buckets
+from services.text_normalization import tokenize
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+# коэффициенты хэш-функций h(x) = (a * x + b) mod PRIME; фиксированы, чтобы сигнатуры в БД оставались верными
+PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.int64)
+_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.int64)
+
+signatures = ContentSignature.__table__
+
+# записи, у которых хотя бы одна корзина совпадает с корзинами bucket_0 ... bucket_{BANDS-1}
+# (запрос собирается один раз, при индексации передаются только параметры).
+# UNION, а не OR: каждая полоса - отдельный поиск по первичному ключу lsh_buckets
+_candidates = select(signatures.c.object_id, signatures.c.signature, signatures.c.duplicate_of).where(
+    signatures.c.kind == bindparam('kind'),
+    signatures.c.object_id.in_(union(*[
+        select(lsh_buckets.c.object_id).where(
+            lsh_buckets.c.kind == bindparam('kind'),
+            lsh_buckets.c.band == band,
+            lsh_buckets.c.bucket == bindparam(f'bucket_{band}')
+        )
+        for band in range(BANDS)
+    ]))
+)
+
+
+def shingles(text):
+    """Множество шинглов текста (короткий текст - одним шинглом)"""
+    words = tokenize(text)
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set):
+    """MinHash-сигнатура множества шинглов (NUM_PERM чисел uint32)"""
+    hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) % PRIME for shingle in shingle_set),
+                         dtype=np.int64, count=len(shingle_set))
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_buckets(signature):
+    """Корзины LSH сигнатуры: по одной на полосу"""
+    return [
+        int.from_bytes(blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+                       'big') >> 1
+        for band in range(BANDS)
+    ]
+
+
+def similarity(signature, other):
+    """Оценка сходства Жаккара по сигнатурам"""
+    return float(np.count_nonzero(signature == other)) / NUM_PERM
+
+
+def load_signature(raw):
+    return np.frombuffer(raw, dtype=np.uint32)
+
+
+class DuplicateService:
+    """
+    Методы:
+    - Проиндексировать запись и найти, копией какой записи она является
+    - Удалить запись из индекса
+    - Сгруппировать существующие дубликаты (пакетная задача администратора)
+    - Группы дубликатов для панели администратора
+    """
+    kinds = {
+        'vacancy': (Vacancy, ('description', 'requirements')),
+        'resume': (Resume, ('experience', 'skills'))
+    }
+
+    threshold = 0.8
+    # сравнивать попарно записи не более чем из стольких записей одной корзины
+    max_bucket_size = 50
+
+    @classmethod
+    def init_app(cls, app):
+        cls.threshold = app.config.get('DUPLICATE_THRESHOLD', 0.8)
+
+    @classmethod
+    def document_text(cls, kind, obj):
+        _, fields = cls.kinds[kind]
+        return ' '.join(getattr(obj, field) or '' for field in fields)
+
+    @staticmethod
+    def _store(connection, kind, object_id, signature, duplicate_of=None, score=None, buckets=None):
+        connection.execute(insert(signatures), {
+            'kind': kind, 'object_id': object_id, 'signature': signature.tobytes(),
+            'duplicate_of': duplicate_of, 'similarity': score
+        })
+        connection.execute(insert(lsh_buckets), [
+            {'kind': kind, 'band': band, 'bucket': bucket, 'object_id': object_id}
+            for band, bucket in enumerate(buckets or band_buckets(signature))
+        ])
+
+    @classmethod
+    def index(cls, connection, kind, object_id, text):
+        """
+        Обновить сигнатуру записи и пометить её копией самой похожей записи (если сходство >= threshold)
+        Возвращает id оригинала или None
+        """
+        cls.remove(connection, kind, object_id)
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None
+        signature = minhash(shingle_set)
+
+        buckets = band_buckets(signature)
+        params = {f'bucket_{band}': bucket for band, bucket in enumerate(buckets)}
+        rows = connection.execute(_candidates, dict(params, kind=kind))
+
+        best, best_score = None, 0.0
+        for row in rows:
+            score = similarity(signature, load_signature(row.signature))
+            if score >= cls.threshold and score > best_score:
+                # копии копий указывают на первоначальную запись
+                best, best_score = row.duplicate_of or row.object_id, score
+
+        cls._store(connection, kind, object_id, signature, best, best_score if best else None, buckets)
+        return best
+
+    @staticmethod
+    def remove(connection, kind, object_id, forget_copies=False):
+        """Удалить запись из индекса; forget_copies - снять пометку с её копий (запись удалена)"""
+        connection.execute(delete(lsh_buckets).where(
+            lsh_buckets.c.kind == kind, lsh_buckets.c.object_id == object_id
+        ))
+        connection.execute(delete(signatures).where(
+            signatures.c.kind == kind, signatures.c.object_id == object_id
+        ))
+        if forget_copies:
+            connection.execute(update(signatures).where(
+                signatures.c.kind == kind, signatures.c.duplicate_of == object_id
+            ).values(duplicate_of=None, similarity=None))
+
+    @staticmethod
+    def duplicate_of(kind, object_id):
+        """id оригинала, копией которого помечена запись, или None"""
+        return db.session.execute(
+            select(signatures.c.duplicate_of).where(signatures.c.kind == kind, signatures.c.object_id == object_id)
+        ).scalar()
+
+    @classmethod
+    def cluster(cls, kind, batch_size=1000):
+        """
+        Пакетная задача: посчитать недостающие сигнатуры и сгруппировать дубликаты
+        Сравниваются только записи, попавшие в одну корзину LSH. Оригинал группы - запись с меньшим id
+        Возвращает количество найденных групп
+        """
+        model, fields = cls.kinds[kind]
+        connection = db.session.connection()
+
+        missing = connection.execute(
+            select(model.id, *[getattr(model, field) for field in fields]).where(~exists().where(
+                signatures.c.kind == kind, signatures.c.object_id == model.id
+            ))
+        ).all()
+        for row in missing:
+            shingle_set = shingles(' '.join(value or '' for value in row[1:]))
+            if shingle_set:
+                cls._store(connection, kind, row.id, minhash(shingle_set))
+
+        shared = select(lsh_buckets.c.band, lsh_buckets.c.bucket).where(lsh_buckets.c.kind == kind).group_by(
+            lsh_buckets.c.band, lsh_buckets.c.bucket
+        ).having(func.count() > 1).subquery()
+        members = connection.execute(
+            select(lsh_buckets.c.band, lsh_buckets.c.bucket, lsh_buckets.c.object_id)
+            .join(shared, and_(shared.c.band == lsh_buckets.c.band, shared.c.bucket == lsh_buckets.c.bucket))
+            .where(lsh_buckets.c.kind == kind)
+            .order_by(lsh_buckets.c.band, lsh_buckets.c.bucket, lsh_buckets.c.object_id)
+        )
+        groups = {}
+        for row in members:
+            groups.setdefault((row.band, row.bucket), []).append(row.object_id)
+
+        candidate_ids = {object_id for group in groups.values() for object_id in group}
+        loaded = {}
+        for start in range(0, len(candidate_ids), batch_size):
+            chunk = list(candidate_ids)[start:start + batch_size]
+            for row in connection.execute(select(signatures.c.object_id, signatures.c.signature).where(
+                    signatures.c.kind == kind, signatures.c.object_id.in_(chunk))):
+                loaded[row.object_id] = load_signature(row.signature)
+
+        # система непересекающихся множеств по проверенным парам
+        parent = {}
+        best_score = {}
+
+        def find(object_id):
+            while parent.get(object_id, object_id) != object_id:
+                object_id = parent[object_id]
+            return object_id
+
+        checked = set()
+        for group in groups.values():
+            group = group[:cls.max_bucket_size]
+            for i, first in enumerate(group):
+                for second in group[i + 1:]:
+                    if (first, second) in checked:
+                        continue
+                    checked.add((first, second))
+                    score = similarity(loaded[first], loaded[second])
+                    if score < cls.threshold:
+                        continue
+                    best_score[second] = max(best_score.get(second, 0.0), score)
+                    best_score.setdefault(first, score)
+                    root_first, root_second = find(first), find(second)
+                    if root_first != root_second:
+                        parent[max(root_first, root_second)] = min(root_first, root_second)
+
+        connection.execute(update(signatures).where(signatures.c.kind == kind).values(
+            duplicate_of=None, similarity=None
+        ))
+        copies = [
+            {'object_id_': object_id, 'root': find(object_id), 'score': best_score[object_id]}
+            for object_id in parent if find(object_id) != object_id
+        ]
+        if copies:
+            connection.execute(
+                update(signatures).where(
+                    signatures.c.kind == kind, signatures.c.object_id == bindparam('object_id_')
+                ).values(duplicate_of=bindparam('root'), similarity=bindparam('score')),
+                copies
+            )
+        db.session.commit()
+        return len({copy['root'] for copy in copies})
+
+    @classmethod
+    def groups(cls, kind, limit=50):
+        """
+        Группы дубликатов: список (оригинал, [(копия, сходство)]), самые большие группы первыми
+        """
+        model, _ = cls.kinds[kind]
+        roots = db.session.execute(
+            select(signatures.c.duplicate_of, func.count().label('copies'))
+            .where(signatures.c.kind == kind, signatures.c.duplicate_of.isnot(None))
+            .group_by(signatures.c.duplicate_of)
+            .order_by(desc('copies'), signatures.c.duplicate_of)
+            .limit(limit)
+        ).all()
+        if not roots:
+            return []
+
+        root_ids = [row.duplicate_of for row in roots]
+        copies = db.session.execute(
+            select(signatures.c.object_id, signatures.c.duplicate_of, signatures.c.similarity)
+            .where(signatures.c.kind == kind, signatures.c.duplicate_of.in_(root_ids))
+            .order_by(signatures.c.object_id)
+        ).all()
+        ids = set(root_ids) | {row.object_id for row in copies}
+        found = {obj.id: obj for obj in model.query.filter(model.id.in_(ids))}
+
+        result = []
+        for root_id in root_ids:
+            members = [(found[row.object_id], row.similarity) for row in copies
+                       if row.duplicate_of == root_id and row.object_id in found]
+            if root_id in found and members:
+                result.append((found[root_id], members))
+        return result
+
+
+def _register_events(kind):
+    model, fields = DuplicateService.kinds[kind]
+
+    def index_obj(mapper, connection, target):
+        DuplicateService.index(connection, kind, target.id, DuplicateService.document_text(kind, target))
+
+    def update_obj(mapper, connection, target):
+        attrs = inspect(target).attrs
+        if any(attrs[field].history.has_changes() for field in fields):
+            index_obj(mapper, connection, target)
+
+    def remove_obj(mapper, connection, target):
+        DuplicateService.remove(connection, kind, target.id, forget_copies=True)
+
+    event.listen(model, 'after_insert', index_obj)
+    event.listen(model, 'after_update', update_obj)
+    event.listen(model, 'after_delete', remove_obj)
+
+
+for _kind in DuplicateService.kinds:
+    _register_events(_kind)
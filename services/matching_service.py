@@ -0,0 +1,457 @@
+"""
+Сервис подбора: подходящие резюме для вакансии и подходящие вакансии для соискателя
+Резюме и вакансии представляются разреженными векторами TF-IDF:
+- слова заголовка, опыта/описания (приведённые к основе стеммером)
+- навыки/требования целиком (канонические имена из справочника навыков) с повышенным весом
+Векторы резюме (и отдельно опубликованных вакансий) хранятся в памяти в виде разреженной матрицы
+по столбцам (numpy): для каждого признака - номера строк и веса. Вакансия сравнивается со всеми резюме
+сразу (сумма столбцов своих признаков через bincount), лучшие k выбираются argpartition.
+
+Изменённые и новые документы после коммита попадают в небольшой "хвост" векторов, а их строки в матрице
+помечаются удалёнными; при большом хвосте или раз в MATCHING_REBUILD_INTERVAL секунд матрица
+перестраивается целиком в фоновом потоке
+"""
+import math
+import threading
+import time
+from array import array
+from collections import Counter
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+from database import db
+from models.resume import Resume
+from models.vacancy import Vacancy
+from models.skill import Skill
+from services.text_normalization import search_terms
+
+PENDING_KEY = 'matching_pending'
+
+# веса частей документа
+TITLE_WEIGHT = 2.0
+TEXT_WEIGHT = 1.0
+SKILL_WEIGHT = 3.0
+
+# поля, от которых зависят векторы
+RESUME_FIELDS = ('title', 'skills', 'experience')
+VACANCY_FIELDS = ('title', 'requirements', 'description')
+
+
+def document_features(title, skills, text):
+    """
+    Признаки документа с весами: {признак: вес}
+    skills - навыки/требования через запятую, text - опыт работы или описание вакансии
+    """
+    features = Counter()
+    for term in search_terms(title or ''):
+        features[term] += TITLE_WEIGHT
+    for term in search_terms(text or ''):
+        features[term] += TEXT_WEIGHT
+    for skill in (skills or '').split(','):
+        name = Skill.canonical_name(skill)
+        if name:
+            features[f'skill:{name}'] += SKILL_WEIGHT
+            # слова навыка тоже совпадают со словами текста ("опыт работы с Django")
+            for term in search_terms(skill):
+                features[term] += TEXT_WEIGHT
+    return features
+
+
+def resume_features(resume):
+    return document_features(resume.title, resume.skills, resume.experience)
+
+
+def vacancy_features(vacancy):
+    return document_features(vacancy.title, vacancy.requirements, vacancy.description)
+
+
+def term_frequency(weight):
+    """Сублинейный TF: повторы слова дают всё меньший прирост"""
+    return 1.0 + math.log(weight) if weight >= 1.0 else weight
+
+
+class VectorIndex:
+    """
+    Разреженная матрица TF-IDF векторов документов (строки - документы, хранение по столбцам)
+    и хвост векторов документов, изменённых после построения
+    """
+
+    def __init__(self, max_delta_ratio=0.05, min_delta=1000):
+        self.max_delta_ratio = max_delta_ratio
+        self.min_delta = min_delta
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.row_of = {}
+        self.vocab = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.col_ptr = np.zeros(1, dtype=np.int64)
+        self.rows = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.delta = {}
+
+    def build(self, documents):
+        """documents - итератор пар (id, {признак: вес})"""
+        ids = array('q')
+        columns = array('l')
+        rows = array('l')
+        frequencies = array('f')
+        vocab = {}
+
+        for row, (obj_id, features) in enumerate(documents):
+            ids.append(obj_id)
+            for term, weight in features.items():
+                columns.append(vocab.setdefault(term, len(vocab)))
+                rows.append(row)
+                frequencies.append(term_frequency(weight))
+
+        count = len(ids)
+        columns = np.asarray(columns, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+
+        document_frequency = np.bincount(columns, minlength=len(vocab))
+        idf = np.log((count + 1.0) / (document_frequency + 1.0)) + 1.0
+        weights = np.asarray(frequencies, dtype=np.float64) * idf[columns]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=count))
+        if len(weights):
+            weights /= norms[rows]
+
+        order = np.argsort(columns, kind='stable')
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.row_of = {obj_id: row for row, obj_id in enumerate(ids)}
+        self.vocab = vocab
+        self.idf = idf.astype(np.float32)
+        self.col_ptr = np.concatenate(([0], np.cumsum(document_frequency))).astype(np.int64)
+        self.rows = rows[order].astype(np.int32)
+        self.weights = weights[order].astype(np.float32)
+        self.alive = np.ones(count, dtype=bool)
+        self.delta = {}
+
+    def vector(self, features):
+        """Нормированный TF-IDF вектор {признак: вес} с весами IDF текущей матрицы"""
+        missing_idf = math.log(len(self.ids) + 1.0) + 1.0
+        vector = {}
+        for term, weight in features.items():
+            column = self.vocab.get(term)
+            idf = float(self.idf[column]) if column is not None else missing_idf
+            vector[term] = term_frequency(weight) * idf
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm:
+            vector = {term: value / norm for term, value in vector.items()}
+        return vector
+
+    def update(self, obj_id, features):
+        """Заменить вектор документа (features=None - удалить документ)"""
+        row = self.row_of.get(obj_id)
+        if row is not None:
+            self.alive[row] = False
+        if features is None:
+            self.delta.pop(obj_id, None)
+        else:
+            self.delta[obj_id] = self.vector(features)
+
+    def needs_rebuild(self):
+        return len(self.delta) > max(self.min_delta, self.max_delta_ratio * len(self.ids))
+
+    def top(self, features, limit=10, exclude=()):
+        """Лучшие документы для признаков features: список (id, косинусная близость)"""
+        query = self.vector(features)
+        candidates = {}
+
+        columns = [(self.vocab[term], weight) for term, weight in query.items() if term in self.vocab]
+        if columns and len(self.ids):
+            starts = [self.col_ptr[column] for column, _ in columns]
+            ends = [self.col_ptr[column + 1] for column, _ in columns]
+            rows = np.concatenate([self.rows[s:e] for s, e in zip(starts, ends)])
+            weights = np.concatenate([
+                self.weights[s:e] * weight for (s, e), (_, weight) in zip(zip(starts, ends), columns)
+            ])
+            scores = np.bincount(rows, weights=weights, minlength=len(self.ids))
+            scores[~self.alive] = 0.0
+
+            # запас на исключённые документы
+            k = min(limit + len(exclude), len(scores))
+            best = np.argpartition(scores, -k)[-k:]
+            for row in best[scores[best] > 0]:
+                candidates[int(self.ids[row])] = float(scores[row])
+
+        for obj_id, vector in self.delta.items():
+            if len(vector) < len(query):
+                score = sum(weight * query.get(term, 0.0) for term, weight in vector.items())
+            else:
+                score = sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            if score > 0:
+                candidates[obj_id] = score
+
+        for obj_id in exclude:
+            candidates.pop(obj_id, None)
+        return sorted(candidates.items(), key=lambda item: (-item[1], -item[0]))[:limit]
+
+
+class VectorStore:
+    """
+    Матрица векторов одного вида документов с перестроением в фоновом потоке (и первое построение тоже).
+    Пока матрица перестраивается, поиск идёт по старой матрице и хвосту изменений, а изменения запоминаются
+    и применяются к новой; пока матрица не построена, поиск не выполняется
+    """
+
+    def __init__(self, load_documents, rebuild_interval=600):
+        # load_documents() - итератор пар (id, признаки) всех документов
+        self.load_documents = load_documents
+        self.rebuild_interval = rebuild_interval
+        self.index = VectorIndex()
+        self.built_at = None
+        self._rebuilding = None
+        # reset() увеличивает поколение: построение, начатое до сброса, отбрасывается
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._build_lock = threading.RLock()
+
+    def reset(self, rebuild_interval):
+        with self._lock:
+            self.rebuild_interval = rebuild_interval
+            self.index = VectorIndex()
+            self.built_at = None
+            self._rebuilding = None
+            self._generation += 1
+
+    def rebuild(self, generation=None):
+        """generation - поколение, для которого запущено построение (фоновый поток); после reset() оно не нужно"""
+        with self._build_lock:
+            with self._lock:
+                if generation is None:
+                    generation = self._generation
+                elif generation != self._generation:
+                    return
+                if self._rebuilding is None:
+                    self._rebuilding = []
+                changes = self._rebuilding
+
+            index = VectorIndex()
+            try:
+                index.build(self.load_documents())
+            except Exception:
+                with self._lock:
+                    if self._rebuilding is changes:
+                        self._rebuilding = None
+                raise
+
+            with self._lock:
+                if generation != self._generation:
+                    return
+                for obj_id, features in changes:
+                    index.update(obj_id, features)
+                self._rebuilding = None
+                self.index = index
+                self.built_at = time.monotonic()
+
+    def _rebuild_in_background(self, app, generation):
+        with app.app_context():
+            try:
+                self.rebuild(generation)
+            except Exception as e:
+                print(f"Matching rebuild error: {e}")
+
+    def start_rebuild(self, app=None):
+        """Перестроить матрицу в фоновом потоке, если она ещё не перестраивается"""
+        with self._lock:
+            if self._rebuilding is not None:
+                return
+            self._rebuilding = []
+            generation = self._generation
+        threading.Thread(target=self._rebuild_in_background,
+                         args=(app or current_app._get_current_object(), generation), daemon=True).start()
+
+    def wait_built(self):
+        """Дождаться построения матрицы (фоновые потоки и команды); если построение не удалось - построить здесь"""
+        with self._build_lock:
+            if self.built_at is None:
+                self.rebuild()
+
+    def ensure_fresh(self, wait=False):
+        if self.built_at is None:
+            if wait:
+                self.wait_built()
+            else:
+                self.start_rebuild()
+            return
+        if self.index.needs_rebuild() or time.monotonic() - self.built_at > self.rebuild_interval:
+            self.start_rebuild()
+
+    def top(self, features, limit=10, exclude=(), wait=False):
+        """
+        Лучшие документы для признаков: список (id, близость)
+        None, пока матрица не построена; wait=True - дождаться построения (не в запросе страницы)
+        """
+        self.ensure_fresh(wait)
+        with self._lock:
+            if self.built_at is None:
+                return None
+            return self.index.top(features, limit, exclude)
+
+    def update(self, obj_id, features):
+        with self._lock:
+            if self.built_at is not None:
+                self.index.update(obj_id, features)
+            if self._rebuilding is not None:
+                self._rebuilding.append((obj_id, features))
+
+
+def _load_batches(query, batch_size):
+    """
+    Строки запроса порциями по id, каждая порция - отдельным коротким чтением
+    (долгое чтение при построении матрицы не должно задерживать запись в БД)
+    """
+    id_column = query.selected_columns[0]
+    last_id = 0
+    while True:
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                query.where(id_column > last_id).order_by(id_column).limit(batch_size)
+            ).all()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1][0]
+
+
+def _load_resumes(batch_size=5000):
+    rows = _load_batches(select(Resume.id, Resume.title, Resume.skills, Resume.experience), batch_size)
+    return ((row.id, document_features(row.title, row.skills, row.experience)) for row in rows)
+
+
+def _load_vacancies(batch_size=5000):
+    rows = _load_batches(
+        select(Vacancy.id, Vacancy.title, Vacancy.requirements, Vacancy.description)
+        .where(Vacancy.status == 'published'),
+        batch_size
+    )
+    return ((row.id, document_features(row.title, row.requirements, row.description)) for row in rows)
+
+
+class MatchingService:
+    """
+    Методы:
+    - Подобрать резюме для вакансии (лучшие k по близости векторов)
+    - Подобрать опубликованные вакансии по признакам (для рекомендаций соискателю)
+    - Учесть изменения резюме и вакансий после коммита
+    """
+    resumes = VectorStore(_load_resumes)
+    vacancies = VectorStore(_load_vacancies)
+    # признаки вакансий, для которых уже выполнялся подбор: {id вакансии: признаки}
+    vacancy_cache = {}
+    vacancy_cache_size = 1024
+
+    _lock = threading.RLock()
+
+    @classmethod
+    def init_app(cls, app):
+        interval = app.config.get('MATCHING_REBUILD_INTERVAL', 600)
+        cls.resumes.reset(interval)
+        cls.vacancies.reset(interval)
+        cls.vacancy_cache = {}
+        # матрицы строятся в фоне с запуска приложения, а не в первом запросе страницы вакансии
+        cls.resumes.start_rebuild(app)
+        cls.vacancies.start_rebuild(app)
+
+    @classmethod
+    def _vacancy_features(cls, vacancy):
+        with cls._lock:
+            features = cls.vacancy_cache.get(vacancy.id)
+            if features is None:
+                features = vacancy_features(vacancy)
+                if len(cls.vacancy_cache) >= cls.vacancy_cache_size:
+                    cls.vacancy_cache.pop(next(iter(cls.vacancy_cache)))
+                cls.vacancy_cache[vacancy.id] = features
+            return features
+
+    @classmethod
+    def match_resumes(cls, vacancy, limit=10):
+        """
+        Подходящие резюме для вакансии: список (резюме, близость от 0 до 1)
+        Пока матрица резюме строится (после запуска приложения) - пустой список
+        """
+        best = cls.resumes.top(cls._vacancy_features(vacancy), limit)
+        if not best:
+            return []
+
+        found = {resume.id: resume for resume in Resume.query.filter(Resume.id.in_([i for i, _ in best]))}
+        return [(found[resume_id], score) for resume_id, score in best if resume_id in found]
+
+    @classmethod
+    def match_vacancies(cls, features, limit=10, exclude=()):
+        """
+        Лучшие опубликованные вакансии для признаков соискателя: список (id вакансии, близость)
+        Вызывается при пересчёте рекомендаций (фоновый поток, команда): ждёт построения матрицы вакансий
+        """
+        return cls.vacancies.top(features, limit, exclude, wait=True)
+
+    @classmethod
+    def apply(cls, changes):
+        """Учесть изменения: changes - список (вид, id, признаки или None)"""
+        for kind, obj_id, features in changes:
+            if kind == 'vacancy':
+                with cls._lock:
+                    cls.vacancy_cache.pop(obj_id, None)
+                cls.vacancies.update(obj_id, features)
+            else:
+                cls.resumes.update(obj_id, features)
+
+
+def _queue(target, kind, features):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(PENDING_KEY, []).append((kind, target.id, features))
+
+
+def _changed(target, fields):
+    attrs = inspect(target).attrs
+    return any(attrs[field].history.has_changes() for field in fields)
+
+
+def _published_features(vacancy):
+    return vacancy_features(vacancy) if vacancy.status == 'published' else None
+
+
+@event.listens_for(Resume, 'after_insert')
+def _resume_inserted(mapper, connection, target):
+    _queue(target, 'resume', resume_features(target))
+
+
+@event.listens_for(Resume, 'after_update')
+def _resume_updated(mapper, connection, target):
+    if _changed(target, RESUME_FIELDS):
+        _queue(target, 'resume', resume_features(target))
+
+
+@event.listens_for(Resume, 'after_delete')
+def _resume_deleted(mapper, connection, target):
+    _queue(target, 'resume', None)
+
+
+@event.listens_for(Vacancy, 'after_insert')
+def _vacancy_inserted(mapper, connection, target):
+    _queue(target, 'vacancy', _published_features(target))
+
+
+@event.listens_for(Vacancy, 'after_update')
+def _vacancy_updated(mapper, connection, target):
+    if _changed(target, VACANCY_FIELDS + ('status',)):
+        _queue(target, 'vacancy', _published_features(target))
+
+
+@event.listens_for(Vacancy, 'after_delete')
+def _vacancy_deleted(mapper, connection, target):
+    _queue(target, 'vacancy', None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_after_commit(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    if changes:
+        MatchingService.apply(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,89 @@
+"""
+Новые уведомления для подключённых клиентов внутри процесса (pub/sub)
+NotificationService публикует уведомления сразу после доставки из outbox, запросы SSE (/notifications/stream)
+и long-poll (/notifications/poll) ждут их на подписке пользователя.
+
+Ожидающий клиент не держит соединение с БД и не опрашивает её: подписка - это очередь и событие.
+Под воркером gevent (gunicorn -k gevent, threading заменяется гринлетами) тысячи простаивающих подключений
+обслуживаются без потока на клиента. Подписки - на процесс: уведомление, доставленное другим процессом,
+клиент получит при переподключении (догоняющий запрос по Last-Event-ID).
+"""
+import threading
+from collections import defaultdict, deque
+
+# сколько ещё не отправленных клиенту уведомлений хранить в подписке
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    """
+    Подписка одного подключения на уведомления пользователя
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._items = deque(maxlen=QUEUE_SIZE)
+        self._ready = threading.Event()
+
+    def push(self, items):
+        self._items.extend(items)
+        self._ready.set()
+
+    def get(self, timeout):
+        """Новые уведомления; ждёт не дольше timeout секунд, пустой список - если ничего не пришло"""
+        if not self._ready.wait(timeout):
+            return []
+        self._ready.clear()
+        items = []
+        while self._items:
+            items.append(self._items.popleft())
+        return items
+
+
+class NotificationHub:
+    """
+    Методы:
+    - Подписаться на уведомления пользователя
+    - Отписаться
+    - Опубликовать уведомления
+    - Количество подключений
+    """
+    # user_id -> подписки
+    _subscribers = defaultdict(set)
+    _lock = threading.Lock()
+
+    @classmethod
+    def subscribe(cls, user_id):
+        subscription = Subscription(user_id)
+        with cls._lock:
+            cls._subscribers[user_id].add(subscription)
+        return subscription
+
+    @classmethod
+    def unsubscribe(cls, subscription):
+        with cls._lock:
+            subscriptions = cls._subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del cls._subscribers[subscription.user_id]
+
+    @classmethod
+    def publish(cls, notifications):
+        """Передать уведомления (словари с полем user_id) подпискам их получателей"""
+        if not cls._subscribers:
+            return
+        by_user = defaultdict(list)
+        for notification in notifications:
+            by_user[notification['user_id']].append(notification)
+        with cls._lock:
+            targets = [(subscription, by_user[user_id])
+                       for user_id in by_user.keys() & cls._subscribers.keys()
+                       for subscription in cls._subscribers[user_id]]
+        for subscription, items in targets:
+            subscription.push(items)
+
+    @classmethod
+    def connections(cls):
+        with cls._lock:
+            return sum(len(subscriptions) for subscriptions in cls._subscribers.values())
@@ -1,9 +1,100 @@
 """
 Сервис уведомлений
 Соответствует СервисУведомлений из диаграммы классов инфраструктуры и NotificationController из sequence диаграммы
+
+Шапка каждой страницы показывает число непрочитанных уведомлений: оно хранится в строке пользователя
+(users.unread_notifications_count), которая и так загружается при входе, - отдельных запросов нет.
+Последние непрочитанные уведомления кэшируются в памяти процесса по пользователю и загружаются
+только если шаблон к ним обращается; кэш сбрасывается после коммита, изменившего уведомления пользователя
+
+Отправка уведомления не делает отдельный коммит: уведомление записывается в notification_outbox
+в транзакции вызывающего кода (и сохраняется её коммитом). Фоновый поток забирает записи outbox пачками
+(DELETE ... RETURNING) и вставляет их в notifications одной транзакцией, поэтому каждое уведомление
+доставляется ровно один раз, в том числе после перезапуска. Доставить вручную: flask --app app deliver-notifications
+
+Рассылка (fan_out) - одно уведомление множеству получателей, например всем откликнувшимся на закрытую вакансию
+или всем пользователям перед техническими работами: получатели выбираются и записываются в outbox одним
+INSERT ... SELECT, без загрузки пользователей в память. Всем пользователям: flask --app app notify-all "Заголовок" "Текст"
+
+Прочитанные уведомления старше NOTIFICATIONS_RETENTION_DAYS дней фоновый поток переносит пачками в архив
+(notification_archive), чтобы таблица notifications оставалась небольшой. Вручную: flask --app app archive-notifications
+
+Доставленные уведомления публикуются подключённым клиентам (services/notification_hub.py): страница получает их
+потоком Server-Sent Events (/notifications/stream), а если браузер его не поддерживает - long-poll (/notifications/poll).
+Соединение держится всё время, пока страница открыта, поэтому обновления включаются настройкой
+NOTIFICATIONS_LIVE_UPDATES только под асинхронным воркером (gevent)
 """
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, func, insert, delete, literal
+from sqlalchemy.orm import Session
 from database import db
-from models.notification import Notification
+from models.notification import (
+    Notification, NotificationOutbox, NotificationArchive, CHANGED_KEY, adjust_unread_count, adjust_unread_counts
+)
+from services.notification_hub import NotificationHub
+from services.user_cache import UserCache
+
+# флаг сессии: в транзакции есть новые записи outbox - разбудить обработчик после коммита
+OUTBOX_KEY = 'notification_outbox'
+
+# поля, которые переносятся из outbox в notifications
+OUTBOX_FIELDS = ('user_id', 'notification_type', 'title', 'message', 'related_id', 'related_type', 'created_at')
+
+# поля, которые переносятся из notifications в архив
+ARCHIVE_FIELDS = ('id',) + OUTBOX_FIELDS
+
+# через сколько миллисекунд браузер переподключается к потоку
+STREAM_RETRY_MS = 3000
+
+# сколько пропущенных уведомлений отдавать клиенту при переподключении
+CATCH_UP_LIMIT = 50
+
+
+def notification_payload(row):
+    """Уведомление для клиента (JSON)"""
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'title': row['title'],
+        'message': row['message'],
+        'notification_type': row['notification_type'],
+        'related_id': row['related_id'],
+        'related_type': row['related_type'],
+        'created_at': row['created_at'].isoformat() if row['created_at'] else None
+    }
+
+
+class RecentUnread:
+    """
+    Последние непрочитанные уведомления пользователя для шаблона: запрос (или чтение кэша) - при первом обращении
+    """
+
+    def __init__(self, user_id, unread_count):
+        self.user_id = user_id
+        self.unread_count = unread_count
+        self._items = None
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = NotificationService.recent_unread(self.user_id) if self.unread_count else []
+        return self._items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
 
 
 class NotificationService:
@@ -13,14 +104,292 @@ class NotificationService:
     - Уведомить соискателя об изменении статуса отклика
     - Реализует notifyApplicant(invitation)(Уведомить соискателя о приглашении) из sequence диаграммы
     - Уведомить пользователя о блокировке
+    - Разослать уведомление множеству пользователей
+    - Уведомить откликнувшихся о закрытии вакансии
+    - Уведомить всех пользователей
+    - Последние непрочитанные уведомления (кэш)
+    - Пересчитать счётчики непрочитанных
+    - Доставить уведомления из outbox
+    - Отметить все уведомления пользователя прочитанными
+    - Перенести старые прочитанные уведомления в архив
+    - Новые уведомления потоком Server-Sent Events
+    - Дождаться новых уведомлений (long-poll)
     """
+    recent_count = 5
+    cache_ttl = 30
+    batch_size = 500
+    poll_interval = 5
+    stream_timeout = 300
+    heartbeat = 15
+    long_poll_timeout = 25
+    retention_days = 90
+    archive_interval = 3600
+
+    # user_id -> (момент устаревания, список словарей уведомлений)
+    _recent = {}
+    _lock = threading.Lock()
+
+    # сигнал фоновому обработчику outbox
+    _wake = threading.Event()
+
+    @classmethod
+    def init_app(cls, app):
+        cls.recent_count = app.config.get('NOTIFICATIONS_RECENT_COUNT', 5)
+        cls.cache_ttl = app.config.get('NOTIFICATIONS_CACHE_TTL', 30)
+        cls.batch_size = app.config.get('NOTIFICATIONS_BATCH_SIZE', 500)
+        cls.poll_interval = app.config.get('NOTIFICATIONS_POLL_INTERVAL', 5)
+        cls.stream_timeout = app.config.get('NOTIFICATIONS_STREAM_TIMEOUT', 300)
+        cls.heartbeat = app.config.get('NOTIFICATIONS_HEARTBEAT', 15)
+        cls.long_poll_timeout = app.config.get('NOTIFICATIONS_LONG_POLL_TIMEOUT', 25)
+        cls.retention_days = app.config.get('NOTIFICATIONS_RETENTION_DAYS', 90)
+        cls.archive_interval = app.config.get('NOTIFICATIONS_ARCHIVE_INTERVAL', 3600)
+        cls._recent.clear()
+        if app.config.get('NOTIFICATIONS_WORKER', True):
+            threading.Thread(target=cls._run_worker, args=(app,), daemon=True).start()
+
+    @classmethod
+    def _run_worker(cls, app):
+        """
+        Фоновый обработчик outbox: доставка сразу после коммита с уведомлениями и раз в poll_interval секунд,
+        перенос старых уведомлений в архив - раз в archive_interval секунд
+        """
+        with app.app_context():
+            next_archive = time.monotonic()
+            while True:
+                try:
+                    cls.deliver_pending()
+                    if cls.archive_interval and time.monotonic() >= next_archive:
+                        next_archive = time.monotonic() + cls.archive_interval
+                        cls.archive_read()
+                except Exception as e:
+                    print(f"Notification delivery error: {e}")
+                cls._wake.wait(cls.poll_interval)
+                cls._wake.clear()
+
+    @classmethod
+    def deliver_pending(cls, batch_size=None):
+        """
+        Перенести уведомления из outbox в notifications, возвращает их количество
+        Каждая пачка - одна транзакция: забрать записи outbox, вставить уведомления, обновить счётчики
+        """
+        batch_size = batch_size or cls.batch_size
+        outbox = NotificationOutbox.__table__
+        delivered = 0
+        while True:
+            with db.engine.begin() as connection:
+                claimed = select(outbox.c.id).order_by(outbox.c.id).limit(batch_size).scalar_subquery()
+                rows = connection.execute(
+                    delete(outbox).where(outbox.c.id.in_(claimed)).returning(outbox)
+                ).mappings().all()
+                if not rows:
+                    break
+                rows = [{field: row[field] for field in OUTBOX_FIELDS} for row in sorted(rows, key=lambda row: row['id'])]
+                table = Notification.__table__
+                ids = connection.execute(
+                    insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                    [row | {'is_read': False} for row in rows]
+                ).scalars().all()
+                unread = Counter(row['user_id'] for row in rows)
+                # один UPDATE на каждое значение прироста: при рассылке это один запрос на пачку
+                by_delta = defaultdict(list)
+                for user_id, count in unread.items():
+                    by_delta[count].append(user_id)
+                for count, user_ids in by_delta.items():
+                    adjust_unread_counts(connection, user_ids, count)
+            cls.invalidate(unread)
+            NotificationHub.publish([notification_payload(row | {'id': id_}) for row, id_ in zip(rows, ids)])
+            delivered += len(rows)
+            if len(rows) < batch_size:
+                break
+        return delivered
+
+    @staticmethod
+    def mark_all_read(user_id):
+        """
+        Отметить все уведомления пользователя прочитанными одним UPDATE
+        Сохраняется коммитом вызывающего кода, возвращает количество отмеченных
+        """
+        table = Notification.__table__
+        result = db.session.execute(
+            db.update(table).where(table.c.user_id == user_id, table.c.is_read.is_(False)).values(is_read=True)
+        )
+        if result.rowcount:
+            adjust_unread_count(db.session.connection(), user_id, -result.rowcount)
+            db.session.info.setdefault(CHANGED_KEY, set()).add(user_id)
+        return result.rowcount
+
+    @classmethod
+    def archive_read(cls, days=None, batch_size=None):
+        """
+        Перенести прочитанные уведомления старше days дней в архив, возвращает их количество
+        Каждая пачка - одна транзакция: удалить из notifications (DELETE ... RETURNING) и вставить в архив
+        """
+        days = cls.retention_days if days is None else days
+        batch_size = batch_size or cls.batch_size
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        table = Notification.__table__
+        archived = 0
+        while True:
+            with db.engine.begin() as connection:
+                claimed = (
+                    select(table.c.id).where(table.c.is_read.is_(True), table.c.created_at < cutoff)
+                    .order_by(table.c.id).limit(batch_size).scalar_subquery()
+                )
+                rows = connection.execute(
+                    delete(table).where(table.c.id.in_(claimed)).returning(*(table.c[field] for field in ARCHIVE_FIELDS))
+                ).mappings().all()
+                if not rows:
+                    break
+                archived_at = datetime.utcnow()
+                connection.execute(insert(NotificationArchive.__table__),
+                                   [dict(row) | {'archived_at': archived_at} for row in rows])
+            archived += len(rows)
+            if len(rows) < batch_size:
+                break
+        return archived
+
+    @classmethod
+    def recent_unread(cls, user_id):
+        """
+        Последние непрочитанные уведомления пользователя (словари с полями уведомления)
+        """
+        cached = cls._recent.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        items = [
+            {
+                'id': notification.id,
+                'title': notification.title,
+                'message': notification.message,
+                'notification_type': notification.notification_type,
+                'related_id': notification.related_id,
+                'related_type': notification.related_type,
+                'created_at': notification.created_at
+            }
+            for notification in Notification.query.filter_by(user_id=user_id, is_read=False)
+            .order_by(Notification.created_at.desc()).limit(cls.recent_count)
+        ]
+        with cls._lock:
+            cls._recent[user_id] = (time.monotonic() + cls.cache_ttl, items)
+        return items
+
+    @classmethod
+    def invalidate(cls, user_ids):
+        """Сбросить кэш уведомлений пользователей и их строки в кэше пользователей (счётчик непрочитанных)"""
+        with cls._lock:
+            for user_id in user_ids:
+                cls._recent.pop(user_id, None)
+        UserCache.invalidate(user_ids)
+
+    @staticmethod
+    def since(user_id, after_id, limit=CATCH_UP_LIMIT):
+        """Уведомления пользователя с id больше after_id (пропущенные клиентом)"""
+        table = Notification.__table__
+        rows = db.session.execute(
+            select(table).where(table.c.user_id == user_id, table.c.id > after_id)
+            .order_by(table.c.id).limit(limit)
+        ).mappings()
+        return [notification_payload(row) for row in rows]
+
+    @staticmethod
+    def last_id(user_id):
+        """id последнего уведомления пользователя (0, если уведомлений нет)"""
+        return db.session.execute(
+            select(func.max(Notification.id)).where(Notification.user_id == user_id)
+        ).scalar() or 0
+
+    @classmethod
+    def stream(cls, user_id, after_id=None):
+        """
+        Новые уведомления пользователя в формате Server-Sent Events (генератор для ответа)
+        after_id - последнее полученное клиентом уведомление (Last-Event-ID), пропущенные отдаются сразу.
+        Поток закрывается через stream_timeout секунд, браузер переподключается сам
+        """
+        subscription = NotificationHub.subscribe(user_id)
+        try:
+            if after_id is None:
+                after_id, backlog = cls.last_id(user_id), []
+            else:
+                backlog = cls.since(user_id, after_id)
+        except Exception:
+            NotificationHub.unsubscribe(subscription)
+            raise
+        # соединение с БД не нужно на время ожидания
+        db.session.close()
+
+        def events():
+            last_id = after_id
+            deadline = time.monotonic() + cls.stream_timeout
+            try:
+                # id без данных запоминается браузером как Last-Event-ID для переподключения
+                yield f'retry: {STREAM_RETRY_MS}\nid: {last_id}\n\n'
+                items = backlog
+                while True:
+                    for item in items:
+                        if item['id'] > last_id:
+                            last_id = item['id']
+                            yield (f"id: {last_id}\nevent: notification\n"
+                                   f"data: {json.dumps(item, ensure_ascii=False)}\n\n")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    items = subscription.get(min(cls.heartbeat, remaining))
+                    if not items:
+                        yield ': keepalive\n\n'
+            finally:
+                NotificationHub.unsubscribe(subscription)
+
+        return events()
+
+    @classmethod
+    def wait_new(cls, user_id, after_id=None, timeout=None):
+        """
+        Дождаться новых уведомлений пользователя (long-poll)
+        Возвращает (уведомления с id больше after_id, id последнего из них); без after_id - сразу, с id последнего
+        """
+        if after_id is None:
+            return [], cls.last_id(user_id)
+
+        subscription = NotificationHub.subscribe(user_id)
+        try:
+            items = cls.since(user_id, after_id)
+            db.session.close()
+            if not items:
+                items = [item for item in subscription.get(timeout or cls.long_poll_timeout) if item['id'] > after_id]
+        finally:
+            NotificationHub.unsubscribe(subscription)
+        return items, max([item['id'] for item in items], default=after_id)
+
+    @staticmethod
+    def reconcile_unread_counts():
+        """
+        Пересчитать счётчики непрочитанных уведомлений по таблице уведомлений
+        Возвращает количество пользователей, у которых счётчик расходился
+        """
+        from models.user import User
+        table = User.__table__
+        actual = (
+            select(func.count()).select_from(Notification)
+            .where(Notification.user_id == table.c.id, Notification.is_read.is_(False))
+            .scalar_subquery()
+        )
+        result = db.session.execute(
+            db.update(table).where(table.c.unread_notifications_count != actual)
+            .values(unread_notifications_count=actual)
+        )
+        db.session.commit()
+        NotificationService._recent.clear()
+        UserCache.clear()
+        return result.rowcount
 
     @staticmethod
     def send_notification(user, title, message, notification_type='system', related_id=None, related_type=None):
         """
         Отправить уведомление пользователю
+        Уведомление сохраняется в outbox следующим коммитом вызывающего кода и доставляется фоновым обработчиком
         """
-        notification = Notification(
+        notification = NotificationOutbox(
             user_id=user.id,
             title=title,
             message=message,
@@ -29,9 +398,61 @@ class NotificationService:
             related_type=related_type
         )
         db.session.add(notification)
-        db.session.commit()
+        db.session.info[OUTBOX_KEY] = True
         return notification
 
+    @staticmethod
+    def fan_out(recipients, title, message, notification_type='system', related_id=None, related_type=None):
+        """
+        Разослать одно уведомление множеству пользователей
+        recipients - запрос id получателей (select одного столбца); получатели выбираются и записываются в outbox
+        одним INSERT ... SELECT в транзакции вызывающего кода. Возвращает количество получателей
+        """
+        outbox = NotificationOutbox.__table__
+        user_ids = recipients.subquery()
+        rows = select(
+            user_ids.c[0],
+            literal(notification_type, outbox.c.notification_type.type),
+            literal(title, outbox.c.title.type),
+            literal(message, outbox.c.message.type),
+            literal(related_id, outbox.c.related_id.type),
+            literal(related_type, outbox.c.related_type.type),
+            literal(datetime.utcnow(), outbox.c.created_at.type)
+        ).distinct()
+        result = db.session.execute(insert(outbox).from_select(OUTBOX_FIELDS, rows))
+        db.session.info[OUTBOX_KEY] = True
+        return result.rowcount
+
+    @staticmethod
+    def notify_vacancy_closed(vacancy):
+        """
+        Уведомить всех откликнувшихся соискателей о закрытии вакансии
+        """
+        from models.application import Application
+        title = 'Вакансия закрыта'
+        message = f'Вакансия "{vacancy.title}", на которую вы откликались, закрыта работодателем'
+
+        return NotificationService.fan_out(
+            select(Application.applicant_id).where(Application.vacancy_id == vacancy.id),
+            title=title,
+            message=message,
+            notification_type='system',
+            related_id=vacancy.id,
+            related_type='vacancy'
+        )
+
+    @staticmethod
+    def notify_all(title, message, role=None):
+        """
+        Уведомить всех незаблокированных пользователей (или пользователей одной роли), например о технических работах
+        """
+        from models.user import User
+        recipients = select(User.id).where(User.is_blocked.isnot(True))
+        if role:
+            recipients = recipients.where(User.role == role)
+
+        return NotificationService.fan_out(recipients, title=title, message=message, notification_type='system')
+
     @staticmethod
     def notify_application(employer, application):
         """
@@ -105,3 +526,18 @@ class NotificationService:
             message=message,
             notification_type='system'
         )
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    user_ids = session.info.pop(CHANGED_KEY, None)
+    if user_ids:
+        NotificationService.invalidate(user_ids)
+    if session.info.pop(OUTBOX_KEY, False):
+        NotificationService._wake.set()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop(CHANGED_KEY, None)
+    session.info.pop(OUTBOX_KEY, None)
@@ -0,0 +1,83 @@
+"""
+Курсорная (keyset) пагинация списков
+Вместо OFFSET/COUNT следующая страница выбирается условием (created_at, id) < (курсор),
+поэтому страница N стоит столько же, сколько первая страница
+"""
+import base64
+import json
+from datetime import datetime
+from database import db
+
+
+def encode_cursor(*values):
+    """Упаковать значения ключа сортировки в непрозрачную строку для URL"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковать курсор. Для пустого или испорченного курсора возвращает None"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class KeysetPage:
+    """
+    Страница результатов:
+    - items - записи страницы
+    - cursor - курсор, по которому получена страница (None для первой)
+    - next_cursor - курсор следующей страницы (None, если страница последняя)
+    """
+
+    def __init__(self, items, cursor=None, next_cursor=None):
+        self.items = items
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, model, cursor=None, per_page=10):
+    """
+    Вернуть страницу query в порядке (created_at, id) по убыванию
+    query не должен содержать собственный order_by
+    """
+    key = decode_cursor(cursor)
+    if key is not None:
+        try:
+            created_at, item_id = datetime.fromisoformat(key[0]), int(key[1])
+        except (IndexError, TypeError, ValueError):
+            key = None
+        else:
+            query = query.filter(db.or_(
+                model.created_at < created_at,
+                db.and_(model.created_at == created_at, model.id < item_id)
+            ))
+
+    items = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+
+    return KeysetPage(items, cursor=cursor if key is not None else None, next_cursor=next_cursor)
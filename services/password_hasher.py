@@ -0,0 +1,165 @@
+"""
+Хэширование и проверка паролей в пуле процессов
+Хэш пароля намеренно дорогой (scrypt), поэтому при входе и регистрации он считается не в потоке запроса,
+а в отдельных процессах (по числу ядер): поток запроса только ждёт результат, остальные страницы
+продолжают обслуживаться, а вход масштабируется по ядрам.
+
+Допуск: одновременно в пуле не больше PASSWORD_HASH_MAX_PENDING задач, лишние сразу отклоняются
+(PasswordHasherBusy - страница входа отвечает 503 с Retry-After), а не копятся в очереди.
+Если процесс пула упал, пул пересоздаётся; хэш никогда не считается в потоке запроса в обход допуска.
+Очередь и отказы видны в метриках /admin/metrics (password_hash_*).
+
+Если параметры хэширования (PASSWORD_HASH_METHOD) изменились, при успешном входе пароль
+перехэшируется новыми параметрами - check_password() сохраняет новый хэш в пользователе.
+"""
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Пул хэширования занят - запрос нужно повторить позже"""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method)
+
+
+def _verify(pwhash, password, method):
+    """(пароль верный, новый хэш - если хэш получен с другими параметрами, иначе None)"""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split('$', 1)[0] == method:
+        return True, None
+    return True, generate_password_hash(password, method)
+
+
+class PasswordHasher:
+    """
+    Методы:
+    - Подключить пул к приложению
+    - Хэш пароля
+    - Проверить пароль
+    - Статистика пула для метрик
+    """
+    # параметры хэша в том виде, в каком они записываются в начало хэша (scrypt:32768:8:1)
+    method = 'scrypt:32768:8:1'
+    workers = 0
+    max_pending = 0
+    timeout = 10
+
+    _pool = None
+    _slots = None
+    _lock = threading.Lock()
+    _stats = Counter()
+
+    @classmethod
+    def init_app(cls, app):
+        cls.method = generate_password_hash('', app.config.get('PASSWORD_HASH_METHOD', 'scrypt')).split('$', 1)[0]
+        cls.workers = app.config.get('PASSWORD_HASH_WORKERS')
+        if cls.workers is None:
+            cls.workers = os.cpu_count() or 1
+        cls.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING') or cls.workers * 4
+        cls.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        with cls._lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(wait=False, cancel_futures=True)
+                cls._pool = None
+            cls._slots = threading.BoundedSemaphore(cls.max_pending) if cls.workers else None
+
+    @classmethod
+    def hash(cls, password):
+        """Хэш пароля с текущими параметрами"""
+        return cls._run('hash', _hash, password, cls.method)
+
+    @classmethod
+    def verify(cls, pwhash, password):
+        """
+        Проверить пароль по хэшу
+        Возвращает (пароль верный, новый хэш или None - если хэш не нужно обновлять)
+        """
+        if not pwhash:
+            return False, None
+        return cls._run('verify', _verify, pwhash, password, cls.method)
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            return {
+                'workers': cls.workers,
+                'max_pending': cls.max_pending,
+                'pending': cls._stats['submitted'] - cls._stats['finished'],
+                'hash': cls._stats['hash'],
+                'verify': cls._stats['verify'],
+                'rejected': cls._stats['rejected'],
+                'timeouts': cls._stats['timeouts'],
+                'broken': cls._stats['broken']
+            }
+
+    @classmethod
+    def _count(cls, *keys):
+        with cls._lock:
+            for key in keys:
+                cls._stats[key] += 1
+
+    @classmethod
+    def _executor(cls):
+        with cls._lock:
+            if cls._pool is None:
+                # spawn - процессы пула не наследуют потоки и блокировки приложения
+                cls._pool = ProcessPoolExecutor(max_workers=cls.workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+            return cls._pool
+
+    @classmethod
+    def _reset(cls, pool):
+        with cls._lock:
+            if cls._pool is pool:
+                cls._pool = None
+
+    @classmethod
+    def _run(cls, operation, function, *args):
+        slots = cls._slots
+        if slots is None:
+            cls._count(operation)
+            return function(*args)
+
+        if not slots.acquire(blocking=False):
+            cls._count('rejected')
+            raise PasswordHasherBusy()
+
+        # пул сломан (упал процесс) - пересоздаём его и повторяем один раз, не отпуская место в допуске
+        future = None
+        for _ in range(2):
+            pool = cls._executor()
+            try:
+                future = pool.submit(function, *args)
+                break
+            except (BrokenProcessPool, RuntimeError):
+                cls._reset(pool)
+        if future is None:
+            slots.release()
+            cls._count('broken')
+            raise PasswordHasherBusy()
+
+        cls._count(operation, 'submitted')
+
+        def finished(_):
+            cls._count('finished')
+            slots.release()
+
+        future.add_done_callback(finished)
+        try:
+            return future.result(timeout=cls.timeout)
+        except TimeoutError:
+            cls._count('timeouts')
+            raise PasswordHasherBusy()
+        except BrokenProcessPool:
+            # процесс упал во время задачи: следующая задача получит новый пул
+            cls._reset(pool)
+            cls._count('broken')
+            raise PasswordHasherBusy()
@@ -0,0 +1,326 @@
+"""
+Сервис персональных рекомендаций вакансий для главной страницы соискателя
+Профиль соискателя - сумма векторов признаков его резюме и (с меньшим весом) вакансий,
+на которые он откликался. Лучшие опубликованные вакансии для профиля (MatchingService.match_vacancies)
+сохраняются одной строкой в таблицу vacancy_recommendations, главная страница читает только её.
+
+Строка пересчитывается фоновым потоком, а не в запросе страницы (страница показывает прежний список):
+- если помечена устаревшей: изменилось резюме соискателя, он откликнулся на вакансию,
+  опубликована вакансия, близкая к его резюме
+- если старше RECOMMENDATIONS_TTL секунд
+- командой flask --app app refresh-recommendations (для всех соискателей, например по cron)
+
+Близкие резюме к опубликованной вакансии ищутся по матрице резюме. Если в процессе она ещё не построена,
+вакансия передаётся фоновому потоку: он дожидается построения матрицы и помечает устаревшими рекомендации владельцев близких резюме
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect, select, update, delete
+from sqlalchemy.orm import Session, object_session, load_only
+from database import db
+from models.user import User
+from models.resume import Resume
+from models.vacancy import Vacancy
+from models.application import Application
+from models.recommendation import Recommendation
+from services.matching_service import MatchingService, resume_features, vacancy_features, RESUME_FIELDS, \
+    VACANCY_FIELDS
+
+# вес вакансий, на которые соискатель уже откликался, в его профиле
+APPLIED_WEIGHT = 0.5
+
+# флаги сессии: опубликованные вакансии, для которых ещё не найдены близкие резюме,
+# и рекомендации, помеченные устаревшими (разбудить фоновый поток после коммита)
+PUBLISHED_KEY = 'recommendations_published'
+STALE_KEY = 'recommendations_stale'
+
+
+class RecommendationService:
+    """
+    Методы:
+    - Рекомендованные вакансии соискателя (из заранее посчитанной строки)
+    - Пересчитать рекомендации соискателя
+    - Пересчитать устаревшие рекомендации (фоновый поток)
+    - Пересчитать рекомендации всех соискателей
+    """
+    count = 10
+    ttl = 86400
+    # сколько ближайших резюме проверять при публикации вакансии
+    fanout = 1000
+    batch_size = 200
+    poll_interval = 60
+    # False - пересчёт в запросе страницы (без фонового потока)
+    worker = True
+
+    # соискатели без строки рекомендаций или с просроченной строкой и вакансии,
+    # опубликованные до построения матрицы резюме, - ждут фонового потока
+    _queued = set()
+    _published = set()
+    _lock = threading.Lock()
+    _wake = threading.Event()
+
+    @classmethod
+    def init_app(cls, app):
+        cls.count = app.config.get('RECOMMENDATIONS_COUNT', 10)
+        cls.ttl = app.config.get('RECOMMENDATIONS_TTL', 86400)
+        cls.fanout = app.config.get('RECOMMENDATIONS_FANOUT', 1000)
+        cls.batch_size = app.config.get('RECOMMENDATIONS_BATCH_SIZE', 200)
+        cls.poll_interval = app.config.get('RECOMMENDATIONS_POLL_INTERVAL', 60)
+        cls.worker = app.config.get('RECOMMENDATIONS_WORKER', True)
+        with cls._lock:
+            cls._queued.clear()
+            cls._published.clear()
+        if cls.worker:
+            threading.Thread(target=cls._run_worker, args=(app,), daemon=True).start()
+
+    @classmethod
+    def _run_worker(cls, app):
+        """Фоновый пересчёт: сразу после коммита, пометившего рекомендации устаревшими, и раз в poll_interval секунд"""
+        with app.app_context():
+            while True:
+                try:
+                    cls.refresh_pending()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Recommendations refresh error: {e}")
+                cls._wake.wait(cls.poll_interval)
+                cls._wake.clear()
+
+    @classmethod
+    def queue(cls, applicant_ids=(), vacancy_ids=()):
+        """Передать фоновому потоку соискателей для пересчёта и опубликованные вакансии"""
+        with cls._lock:
+            cls._queued.update(applicant_ids)
+            cls._published.update(vacancy_ids)
+        cls._wake.set()
+
+    @classmethod
+    def apply_published(cls):
+        """Пометить устаревшими рекомендации владельцев резюме, близких к вакансиям, опубликованным до построения матрицы"""
+        with cls._lock:
+            vacancy_ids, cls._published = cls._published, set()
+        if not vacancy_ids:
+            return
+        vacancies = Vacancy.query.options(
+            load_only(Vacancy.title, Vacancy.requirements, Vacancy.description)
+        ).filter(Vacancy.id.in_(vacancy_ids), Vacancy.status == 'published')
+        for vacancy in vacancies:
+            _mark_nearest_stale(db.session.connection(), vacancy, wait=True)
+        db.session.commit()
+
+    @classmethod
+    def refresh_pending(cls):
+        """
+        Пересчитать устаревшие и переданные фоновому потоку рекомендации
+        Возвращает количество пересчитанных соискателей
+        """
+        cls.apply_published()
+        with cls._lock:
+            applicant_ids, cls._queued = cls._queued, set()
+
+        table = Recommendation.__table__
+        processed = 0
+        while True:
+            batch = set(db.session.scalars(
+                select(table.c.applicant_id).where(table.c.stale.is_(True)).limit(cls.batch_size)
+            ))
+            while applicant_ids and len(batch) < cls.batch_size:
+                batch.add(applicant_ids.pop())
+            if not batch:
+                break
+            for applicant_id in batch:
+                cls.refresh(applicant_id, commit=False)
+            db.session.commit()
+            processed += len(batch)
+        return processed
+
+    @staticmethod
+    def applicant_profile(applicant_id):
+        """Признаки соискателя и id вакансий, на которые он уже откликнулся"""
+        features = Counter()
+        resumes = Resume.query.options(
+            load_only(Resume.title, Resume.skills, Resume.experience)
+        ).filter_by(applicant_id=applicant_id)
+        for resume in resumes:
+            features.update(resume_features(resume))
+
+        applied_ids = []
+        applied = Vacancy.query.options(
+            load_only(Vacancy.title, Vacancy.requirements, Vacancy.description)
+        ).join(Application, Application.vacancy_id == Vacancy.id).filter(Application.applicant_id == applicant_id)
+        for vacancy in applied:
+            applied_ids.append(vacancy.id)
+            for term, weight in vacancy_features(vacancy).items():
+                features[term] += APPLIED_WEIGHT * weight
+
+        return features, applied_ids
+
+    @classmethod
+    def compute(cls, applicant_id):
+        """Посчитать список id рекомендованных вакансий"""
+        features, applied_ids = cls.applicant_profile(applicant_id)
+        if not features:
+            return []
+        best = MatchingService.match_vacancies(features, cls.count, exclude=applied_ids)
+        return [vacancy_id for vacancy_id, _ in best]
+
+    @classmethod
+    def refresh(cls, applicant_id, commit=True):
+        """Пересчитать и сохранить рекомендации соискателя"""
+        recommendation = db.session.get(Recommendation, applicant_id)
+        if recommendation is None:
+            recommendation = Recommendation(applicant_id=applicant_id)
+            db.session.add(recommendation)
+        recommendation.vacancy_ids = ','.join(str(vacancy_id) for vacancy_id in cls.compute(applicant_id))
+        recommendation.stale = False
+        recommendation.computed_at = datetime.utcnow()
+        if commit:
+            db.session.commit()
+        return recommendation
+
+    @classmethod
+    def refresh_all(cls, batch_size=200):
+        """Пересчитать рекомендации всех соискателей, возвращает их количество"""
+        processed = 0
+        last_id = 0
+        while True:
+            applicant_ids = db.session.scalars(
+                select(User.id).where(User.role == 'applicant', User.id > last_id)
+                .order_by(User.id).limit(batch_size)
+            ).all()
+            if not applicant_ids:
+                break
+            for applicant_id in applicant_ids:
+                cls.refresh(applicant_id, commit=False)
+            db.session.commit()
+            processed += len(applicant_ids)
+            last_id = applicant_ids[-1]
+        return processed
+
+    @classmethod
+    def recommended_vacancies(cls, applicant_id, limit=5):
+        """
+        Рекомендованные опубликованные вакансии соискателя
+        Одно чтение строки рекомендаций и одна выборка вакансий по id. Устаревшая строка показывается как есть
+        и пересчитывается фоновым потоком; пока строки нет - пустой список
+        """
+        recommendation = db.session.get(Recommendation, applicant_id)
+        expired = recommendation is None or recommendation.computed_at < datetime.utcnow() - timedelta(seconds=cls.ttl)
+        if cls.worker:
+            if expired:
+                cls.queue(applicant_ids=[applicant_id])
+        else:
+            try:
+                cls.apply_published()
+                if expired or recommendation.stale:
+                    recommendation = cls.refresh(applicant_id)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Recommendations refresh error: {e}")
+                return []
+
+        if recommendation is None:
+            return []
+        vacancy_ids = recommendation.get_vacancy_ids()
+        if not vacancy_ids:
+            return []
+        found = {
+            vacancy.id: vacancy
+            for vacancy in Vacancy.query.filter(Vacancy.id.in_(vacancy_ids), Vacancy.status == 'published')
+        }
+        return [found[vacancy_id] for vacancy_id in vacancy_ids if vacancy_id in found][:limit]
+
+
+def _mark_stale(connection, applicants):
+    """applicants - id соискателя или подзапрос id"""
+    table = Recommendation.__table__
+    condition = (table.c.applicant_id == applicants if isinstance(applicants, int)
+                 else table.c.applicant_id.in_(applicants))
+    connection.execute(update(table).where(condition, table.c.stale.is_(False)).values(stale=True))
+
+
+def _mark_nearest_stale(connection, vacancy, wait=False):
+    """
+    Устаревают рекомендации владельцев резюме, близких к вакансии
+    wait=True - дождаться построения матрицы резюме (фоновый поток); иначе False, если она ещё не построена
+    """
+    nearest = MatchingService.resumes.top(vacancy_features(vacancy), RecommendationService.fanout, wait=wait)
+    if nearest is None:
+        return False
+    if nearest:
+        resume_ids = [resume_id for resume_id, _ in nearest]
+        _mark_stale(connection, select(Resume.applicant_id).where(Resume.id.in_(resume_ids)))
+    return True
+
+
+def _session_info(target):
+    session = object_session(target)
+    return session.info if session is not None else {}
+
+
+def _applicant_changed(connection, target):
+    _mark_stale(connection, target.applicant_id)
+    _session_info(target)[STALE_KEY] = True
+
+
+@event.listens_for(Resume, 'after_insert')
+@event.listens_for(Resume, 'after_delete')
+def _resume_inserted_or_deleted(mapper, connection, target):
+    _applicant_changed(connection, target)
+
+
+@event.listens_for(Resume, 'after_update')
+def _resume_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if any(attrs[field].history.has_changes() for field in RESUME_FIELDS):
+        _applicant_changed(connection, target)
+
+
+@event.listens_for(Application, 'after_insert')
+@event.listens_for(Application, 'after_delete')
+def _application_changed(mapper, connection, target):
+    _applicant_changed(connection, target)
+
+
+def _vacancy_published(connection, vacancy):
+    """Новая или изменённая опубликованная вакансия: устаревают рекомендации владельцев близких резюме"""
+    info = _session_info(vacancy)
+    if _mark_nearest_stale(connection, vacancy):
+        info[STALE_KEY] = True
+    else:
+        # матрица резюме ещё не построена - близкие резюме найдёт фоновый поток
+        info.setdefault(PUBLISHED_KEY, set()).add(vacancy.id)
+
+
+@event.listens_for(Vacancy, 'after_insert')
+def _vacancy_inserted(mapper, connection, target):
+    if target.status == 'published':
+        _vacancy_published(connection, target)
+
+
+@event.listens_for(Vacancy, 'after_update')
+def _vacancy_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if target.status == 'published' and any(
+            attrs[field].history.has_changes() for field in VACANCY_FIELDS + ('status',)):
+        _vacancy_published(connection, target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session):
+    vacancy_ids = session.info.pop(PUBLISHED_KEY, None)
+    if session.info.pop(STALE_KEY, False) or vacancy_ids:
+        RecommendationService.queue(vacancy_ids=vacancy_ids or ())
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop(PUBLISHED_KEY, None)
+    session.info.pop(STALE_KEY, None)
+
+
+@event.listens_for(User, 'after_delete', propagate=True)
+def _user_deleted(mapper, connection, target):
+    table = Recommendation.__table__
+    connection.execute(delete(table).where(table.c.applicant_id == target.id))
@@ -0,0 +1,243 @@
+"""
+Метрики HTTP-запросов по эндпоинтам в формате Prometheus (/admin/metrics)
+- гистограмма времени ответа (и оценки p50/p95/p99 по ней)
+- количество ответов по коду статуса
+- время в БД и количество SQL-запросов (из services/sql_profiler.py), время рендеринга шаблонов
+- очередь и отказы пула хэширования паролей (services/password_hasher.py)
+
+Запись без блокировок: каждый поток пишет в свой буфер, буферы складываются только при чтении метрик.
+Буферы завершившихся потоков сливаются в общий. Метрики - на процесс (при нескольких воркерах
+каждый отдаёт свои, Prometheus суммирует их по меткам).
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from flask import g, request, template_rendered, before_render_template
+
+# верхние границы корзин гистограммы, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# после скольких буферов потоков проверять, какие потоки уже завершились
+MAX_THREAD_BUFFERS = 64
+
+
+class MetricsBuffer:
+    """
+    Накопленные метрики (одного потока или сумма)
+    Ключ метрик - (эндпоинт, blueprint)
+    """
+
+    def __init__(self):
+        self.latency = {}
+        self.latency_sum = Counter()
+        self.responses = Counter()
+        self.db_seconds = Counter()
+        self.db_queries = Counter()
+        self.template_seconds = Counter()
+
+    def record(self, key, method, status, duration, db_seconds, db_queries, template_seconds):
+        counts = self.latency.get(key)
+        if counts is None:
+            counts = self.latency[key] = [0] * (len(BUCKETS) + 1)
+        counts[bisect_left(BUCKETS, duration)] += 1
+        self.latency_sum[key] += duration
+        self.responses[key + (method, status)] += 1
+        self.db_seconds[key] += db_seconds
+        self.db_queries[key] += db_queries
+        self.template_seconds[key] += template_seconds
+
+    def merge(self, other):
+        for key, counts in list(other.latency.items()):
+            total = self.latency.setdefault(key, [0] * (len(BUCKETS) + 1))
+            for index, count in enumerate(list(counts)):
+                total[index] += count
+        for name in ('latency_sum', 'responses', 'db_seconds', 'db_queries', 'template_seconds'):
+            getattr(self, name).update(dict(getattr(other, name)))
+
+
+def estimate_quantile(counts, quantile):
+    """Оценка квантиля по корзинам гистограммы (линейная интерполяция, как histogram_quantile)"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = quantile * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if cumulative + count >= rank and count:
+            if index == len(BUCKETS):
+                return BUCKETS[-1]
+            lower = BUCKETS[index - 1] if index else 0.0
+            return lower + (BUCKETS[index] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return BUCKETS[-1]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class RequestMetrics:
+    """
+    Методы:
+    - Подключить сбор метрик к приложению
+    - Сумма метрик всех потоков
+    - Метрики в текстовом формате Prometheus
+    """
+    enabled = True
+    token = None
+
+    _local = threading.local()
+    # (поток, его буфер); блокировка - только при появлении нового потока и при чтении метрик
+    _buffers = []
+    _retired = MetricsBuffer()
+    _lock = threading.Lock()
+
+    @classmethod
+    def init_app(cls, app):
+        cls.enabled = app.config.get('REQUEST_METRICS', True)
+        cls.token = app.config.get('METRICS_TOKEN')
+        if not cls.enabled:
+            return
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+        before_render_template.connect(_template_started, app)
+        template_rendered.connect(_template_finished, app)
+
+    @classmethod
+    def buffer(cls):
+        """Буфер текущего потока"""
+        buffer = getattr(cls._local, 'buffer', None)
+        if buffer is None:
+            buffer = cls._local.buffer = MetricsBuffer()
+            with cls._lock:
+                if len(cls._buffers) >= MAX_THREAD_BUFFERS:
+                    cls._retire_finished()
+                cls._buffers.append((threading.current_thread(), buffer))
+        return buffer
+
+    @classmethod
+    def _retire_finished(cls):
+        """Слить буферы завершившихся потоков в общий (вызывается под блокировкой)"""
+        alive = []
+        for thread, buffer in cls._buffers:
+            if thread.is_alive():
+                alive.append((thread, buffer))
+            else:
+                cls._retired.merge(buffer)
+        cls._buffers[:] = alive
+
+    @classmethod
+    def snapshot(cls):
+        """Сумма метрик всех потоков"""
+        total = MetricsBuffer()
+        with cls._lock:
+            cls._retire_finished()
+            total.merge(cls._retired)
+            for _, buffer in cls._buffers:
+                total.merge(buffer)
+        return total
+
+    @classmethod
+    def render(cls):
+        """Метрики в текстовом формате Prometheus"""
+        data = cls.snapshot()
+        lines = [
+            '# HELP http_request_duration_seconds Время ответа по эндпоинтам',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for (endpoint, blueprint), counts in sorted(data.latency.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += count
+                labels = _labels(endpoint=endpoint, blueprint=blueprint, le=bound)
+                lines.append(f'http_request_duration_seconds_bucket{labels} {cumulative}')
+            labels = _labels(endpoint=endpoint, blueprint=blueprint)
+            lines.append(f'http_request_duration_seconds_sum{labels} {data.latency_sum[(endpoint, blueprint)]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{labels} {cumulative}')
+
+        lines += [
+            '# HELP http_request_duration_quantile_seconds Оценка p50/p95/p99 времени ответа по гистограмме',
+            '# TYPE http_request_duration_quantile_seconds gauge',
+        ]
+        for (endpoint, blueprint), counts in sorted(data.latency.items()):
+            for quantile in QUANTILES:
+                labels = _labels(endpoint=endpoint, blueprint=blueprint, quantile=quantile)
+                lines.append(f'http_request_duration_quantile_seconds{labels} '
+                             f'{estimate_quantile(counts, quantile):.6f}')
+
+        lines += [
+            '# HELP http_responses_total Ответы по эндпоинтам и кодам статуса',
+            '# TYPE http_responses_total counter',
+        ]
+        for (endpoint, blueprint, method, status), count in sorted(data.responses.items()):
+            labels = _labels(endpoint=endpoint, blueprint=blueprint, method=method, status=status)
+            lines.append(f'http_responses_total{labels} {count}')
+
+        for name, counter, help_text, value_format in (
+                ('http_request_db_seconds_total', data.db_seconds, 'Время SQL-запросов', '{:.6f}'),
+                ('http_request_db_queries_total', data.db_queries, 'Количество SQL-запросов', '{}'),
+                ('http_request_template_seconds_total', data.template_seconds, 'Время рендеринга шаблонов',
+                 '{:.6f}')):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (endpoint, blueprint), value in sorted(counter.items()):
+                lines.append(f'{name}{_labels(endpoint=endpoint, blueprint=blueprint)} '
+                             f'{value_format.format(value)}')
+
+        from services.password_hasher import PasswordHasher
+        hasher = PasswordHasher.stats()
+        lines += [
+            '# HELP password_hash_pending Задачи хэширования паролей в пуле (в очереди и выполняются)',
+            '# TYPE password_hash_pending gauge',
+            f'password_hash_pending {hasher["pending"]}',
+            '# HELP password_hash_max_pending Сколько задач хэширования допускается одновременно',
+            '# TYPE password_hash_max_pending gauge',
+            f'password_hash_max_pending {hasher["max_pending"]}',
+            '# HELP password_hash_tasks_total Задачи хэширования паролей по операциям',
+            '# TYPE password_hash_tasks_total counter',
+            f'password_hash_tasks_total{_labels(operation="hash")} {hasher["hash"]}',
+            f'password_hash_tasks_total{_labels(operation="verify")} {hasher["verify"]}',
+            '# HELP password_hash_rejected_total Отклонённые из-за переполнения пула, не дождавшиеся результата и при падении пула',
+            '# TYPE password_hash_rejected_total counter',
+            f'password_hash_rejected_total{_labels(reason="busy")} {hasher["rejected"]}',
+            f'password_hash_rejected_total{_labels(reason="timeout")} {hasher["timeouts"]}',
+            f'password_hash_rejected_total{_labels(reason="broken")} {hasher["broken"]}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_template_seconds = 0.0
+
+
+def _template_started(sender, template, context, **extra):
+    g.metrics_template_started = time.perf_counter()
+
+
+def _template_finished(sender, template, context, **extra):
+    started = g.pop('metrics_template_started', None)
+    if started is not None and 'metrics_template_seconds' in g:
+        g.metrics_template_seconds += time.perf_counter() - started
+
+
+def _finish_request(response):
+    started = g.get('metrics_started')
+    if started is None:
+        return response
+
+    from services.sql_profiler import SqlProfiler
+    queries = SqlProfiler.current()
+    RequestMetrics.buffer().record(
+        (request.endpoint or 'unmatched', request.blueprint or 'main'),
+        request.method, response.status_code, time.perf_counter() - started,
+        queries.duration if queries else 0.0, queries.count if queries else 0,
+        g.metrics_template_seconds
+    )
+    return response
@@ -0,0 +1,177 @@
+"""
+Кэш результатов поиска вакансий
+Хранит списки id найденных вакансий по ключу (нормализованный запрос, курсор страницы).
+Кэш ограничен по размеру (LRU) и времени жизни записей (TTL) и очищается после коммита,
+изменившего множество опубликованных вакансий: создание/редактирование/удаление опубликованной
+вакансии, опубликовать(), закрыть(). Правки черновиков кэш не сбрасывают.
+
+Кэш живёт в памяти процесса: в других процессах изменения становятся видны не позже чем через TTL
+"""
+import threading
+import time
+from collections import OrderedDict
+from markupsafe import Markup
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from models.vacancy import Vacancy
+from services.pagination import KeysetPage, keyset_paginate
+from services.search_service import SearchService
+from services.text_normalization import tokenize
+
+DIRTY_FLAG = 'vacancy_search_dirty'
+
+# поля, от которых зависят состав и порядок результатов и фрагменты
+SEARCH_FIELDS = ('title', 'description', 'requirements', 'status', 'created_at')
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш с временем жизни записей и счётчиками попаданий
+    """
+
+    def __init__(self, max_size=512, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(100.0 * self.hits / total, 1) if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+class VacancySearchCache:
+    """
+    Методы:
+    - Найти вакансии (через кэш) - для списка вакансий найтиВакансии(фильтр)
+    - Сбросить кэш
+    - Статистика кэша для администратора
+    """
+    cache = LRUCache()
+
+    @classmethod
+    def init_app(cls, app):
+        cls.cache = LRUCache(
+            max_size=app.config.get('VACANCY_SEARCH_CACHE_SIZE', 512),
+            ttl=app.config.get('VACANCY_SEARCH_CACHE_TTL', 60)
+        )
+
+    @classmethod
+    def search(cls, query, per_page, cursor=None):
+        """
+        Страница опубликованных вакансий (KeysetPage) и словарь фрагментов {id: фрагмент}
+        Пустой запрос - последние опубликованные вакансии, иначе - поиск по индексу
+        """
+        terms = ' '.join(tokenize(query))
+        if query and not terms:
+            return KeysetPage([]), {}
+
+        key = (terms, cursor or '', per_page)
+        cached = cls.cache.get(key)
+        if cached is not None:
+            ids, page_cursor, next_cursor, snippets = cached
+            found = {}
+            if ids:
+                found = {v.id: v for v in Vacancy.query.filter(Vacancy.id.in_(ids))}
+            items = [found[vacancy_id] for vacancy_id in ids if vacancy_id in found]
+            snippets = {vacancy_id: Markup(snippet) for vacancy_id, snippet in snippets.items()}
+            return KeysetPage(items, cursor=page_cursor, next_cursor=next_cursor), snippets
+
+        if terms:
+            page, snippets = SearchService.search('vacancies', query, per_page, cursor)
+        else:
+            page = keyset_paginate(Vacancy.query.filter_by(status='published'), Vacancy,
+                                   cursor=cursor, per_page=per_page)
+            snippets = {}
+
+        cls.cache.set(key, (
+            [vacancy.id for vacancy in page.items],
+            page.cursor,
+            page.next_cursor,
+            {vacancy_id: str(snippet) for vacancy_id, snippet in snippets.items()}
+        ))
+        return page, snippets
+
+    @classmethod
+    def invalidate(cls):
+        cls.cache.clear()
+
+    @classmethod
+    def stats(cls):
+        return cls.cache.stats()
+
+
+def _mark_dirty(target):
+    session = object_session(target)
+    if session is not None:
+        session.info[DIRTY_FLAG] = True
+
+
+@event.listens_for(Vacancy, 'after_insert')
+@event.listens_for(Vacancy, 'after_delete')
+def _vacancy_inserted_or_deleted(mapper, connection, target):
+    if target.status == 'published':
+        _mark_dirty(target)
+
+
+@event.listens_for(Vacancy, 'after_update')
+def _vacancy_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if not any(attrs[field].history.has_changes() for field in SEARCH_FIELDS):
+        return
+    if target.status == 'published' or 'published' in (attrs.status.history.deleted or ()):
+        _mark_dirty(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop(DIRTY_FLAG, False):
+        VacancySearchCache.invalidate()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop(DIRTY_FLAG, None)
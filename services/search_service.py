@@ -0,0 +1,602 @@
+"""
+Сервис полнотекстового поиска
+Заменяет сканирование ilike('%q%') поисковыми индексами:
+- vacancies - опубликованные вакансии (найтиВакансии(фильтр))
+- resumes - резюме (searchResumes(criteria) из sequence диаграммы)
+- users - пользователи (поиск в панели администратора): индекс триграмм (токенизатор FTS5 trigram),
+  ищет подстроку имени или email, как ilike('%q%'), но по индексу
+
+Индекс резюме дополнительно содержит столбец skill_tokens: каждый навык резюме одним токеном
+(каноническое имя из справочника навыков), совпадения с ним поднимают резюме в выдаче.
+Фильтр навыков с логикой И/ИЛИ выполняется по таблице связей resume_skills (models/skill.py)
+
+Реализации индекса:
+- SqliteFtsSearch - индекс SQLite FTS5 (основная БД)
+- LikeSearch - поиск через LIKE для остальных СУБД (запасной вариант)
+
+Для списков с большим числом совпадений count() считает совпадения только до заданного предела
+(«найдено больше 1000»), а не все
+
+Текст нормализуется при записи (ё→е, регистр Unicode приводит токенизатор unicode61),
+слова запроса нормализуются так же и приводятся к основе русским стеммером.
+Индексы обновляются событиями ORM в той же транзакции, что и сами записи
+"""
+from datetime import datetime
+from markupsafe import Markup, escape
+from sqlalchemy import column, event, func, intersect, literal_column, select, table, text
+from sqlalchemy.orm import Session, load_only
+from database import db
+from models.user import User
+from models.resume import Resume
+from models.vacancy import Vacancy
+from models.skill import Skill, resume_skills
+from services.pagination import KeysetPage, encode_cursor, decode_cursor
+from services.text_normalization import WORD_RE, fold_yo, normalize_text, search_terms, skill_words
+
+# слова запроса короче трёх символов (из них не составить триграмму) ищутся по началу слов
+# в таблице <индекс>_words: одна строка на пару (первые SHORT_PREFIX символов слова, id записи)
+SHORT_PREFIX = 2
+
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+
+def highlight_snippet(raw_snippet):
+    """Экранировать фрагмент и подсветить найденные слова"""
+    if not raw_snippet:
+        return None
+    escaped = str(escape(raw_snippet))
+    return Markup(escaped.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>'))
+
+
+def like_pattern(value):
+    """Шаблон LIKE "содержит value": значение приведено normalize_text(), спецсимволы LIKE экранированы"""
+    return '%' + normalize_text(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def contains_text(column, value):
+    """
+    Условие "column содержит value" без учёта регистра и ё/е
+    В SQLite lower() и LIKE меняют регистр только у ASCII, поэтому столбец приводится
+    функцией normalize_text(), зарегистрированной в соединениях (database.register_sql_functions)
+    """
+    pattern = like_pattern(value)
+    if db.engine.dialect.name == 'sqlite':
+        folded = func.normalize_text(column)
+    else:
+        folded = func.replace(func.lower(column), 'ё', 'е')
+    return folded.like(pattern, escape='\\')
+
+
+class SearchIndex:
+    """
+    Описание индексируемой сущности
+    """
+    name = None
+    model = None
+    fields = ()
+    weights = ()
+
+    # вычисляемые столбцы индекса (значения дает extra_values())
+    extra_columns = ()
+    tokenizer = 'unicode61'
+    # индексы префиксов FTS5 (None - без них)
+    prefixes = '2 3'
+    # поиск подстрок (индекс триграмм): слова запроса ищутся целиком, без стемминга и префиксов;
+    # текст в индексе хранится приведённым (normalize_text); слова короче трёх символов - по началу слов
+    substring = False
+    # столбец для фрагмента snippet() (-1 - выбирается автоматически)
+    snippet_column = -1
+
+    # фильтр по навыкам: столбец id записи в таблице связей с навыками
+    skill_owner_column = None
+
+    # SQL-условие отбора строк в индекс (для перестроения)
+    condition = None
+
+    def is_indexed(self, obj):
+        return True
+
+    def extra_values(self, obj):
+        return {}
+
+    def filter(self, query):
+        return query
+
+    def skill_filter(self, skills, match_all=True):
+        """Подзапрос id записей с навыками skills (все или хотя бы один) или None"""
+        skills = [skill for skill in skills or () if skill.strip()]
+        if self.skill_owner_column is None or not skills:
+            return None
+        return Skill.owner_ids(self.skill_owner_column, skills, match_all)
+
+
+class VacancyIndex(SearchIndex):
+    name = 'vacancies'
+    model = Vacancy
+    fields = ('title', 'description', 'requirements')
+    weights = (10.0, 1.0, 4.0)
+    condition = "status = 'published'"
+
+    def is_indexed(self, vacancy):
+        return vacancy.status == 'published'
+
+    def filter(self, query):
+        return query.filter(Vacancy.status == 'published')
+
+
+class ResumeIndex(SearchIndex):
+    name = 'resumes'
+    model = Resume
+    fields = ('title', 'skills', 'experience')
+    extra_columns = ('skill_tokens',)
+    weights = (10.0, 6.0, 1.0, 8.0)
+    tokenizer = "unicode61 tokenchars '_'"
+    snippet_column = 2
+    skill_owner_column = resume_skills.c.resume_id
+
+    def extra_values(self, resume):
+        # навык целиком и отдельные его слова: "Python 3.11+" находится и по "python 3.11", и по "python"
+        tokens = []
+        for skill in resume.get_skills_list():
+            words = skill_words(skill)
+            tokens.append(Skill.canonical_name(skill))
+            if len(words) > 1:
+                tokens.extend(words)
+        return {'skill_tokens': ' '.join(token for token in tokens if token)}
+
+
+class UserIndex(SearchIndex):
+    name = 'users'
+    model = User
+    fields = ('name', 'email')
+    weights = (1.0, 1.0)
+    # регистр учитывается и в самом тексте индекса (normalize_text), и в токенизаторе
+    tokenizer = 'trigram case_sensitive 0'
+    prefixes = None
+    substring = True
+
+
+class SearchBackend:
+    """
+    Интерфейс поискового индекса
+    """
+    name = None
+
+    def __init__(self, index, stemming=True):
+        self.index_definition = index
+        self.stemming = stemming
+
+    def setup(self, connection):
+        """Создать структуры индекса (если нужно)"""
+
+    def rebuild(self, connection):
+        """Полностью перестроить индекс по основной таблице"""
+
+    def index(self, connection, obj):
+        """Добавить/обновить запись в индексе"""
+
+    def remove(self, connection, obj_id):
+        """Удалить запись из индекса"""
+
+    def search(self, query, limit, after=None, skills=None, match_all=True):
+        """
+        Вернуть список (id, фрагмент, ключ сортировки) в порядке релевантности
+        after - ключ сортировки последней записи предыдущей страницы
+        skills - навыки, которые должны быть все (match_all) или хотя бы один
+        """
+        raise NotImplementedError
+
+    def matching_ids(self, query, skills=None, match_all=True):
+        """Подзапрос с id всех найденных записей (для фильтра id IN (...))"""
+        raise NotImplementedError
+
+
+class SqliteFtsSearch(SearchBackend):
+    """
+    Индекс SQLite FTS5 с ранжированием bm25 и фрагментами snippet()
+    """
+    name = 'fts5'
+
+    @staticmethod
+    def is_available(connection):
+        try:
+            connection.execute(text('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)'))
+            connection.execute(text('DROP TABLE temp.fts5_probe'))
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def supports_tokenizer(connection, tokenizer):
+        """Есть ли токенизатор в этой сборке SQLite (trigram - с версии 3.34)"""
+        try:
+            connection.execute(text(f'CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize="{tokenizer}")'))
+            connection.execute(text('DROP TABLE temp.fts5_probe'))
+            return True
+        except Exception:
+            return False
+
+    @property
+    def table(self):
+        return f'{self.index_definition.name}_fts'
+
+    @property
+    def columns(self):
+        return self.index_definition.fields + self.index_definition.extra_columns
+
+    @property
+    def words_table(self):
+        return f'{self.index_definition.name}_words'
+
+    def create_words_sql(self):
+        # WITHOUT ROWID - строки лежат прямо в B-дереве по (prefix, doc_id): поиск по началу слова - диапазон ключа
+        return (f'CREATE TABLE {self.words_table} (prefix TEXT NOT NULL, doc_id INTEGER NOT NULL, '
+                f'PRIMARY KEY (prefix, doc_id)) WITHOUT ROWID')
+
+    def create_sql(self):
+        # prefix='2 3' - индексы префиксов, чтобы запросы "pyth"* не перебирали весь словарь
+        options = f'tokenize="{self.index_definition.tokenizer}"'
+        if self.index_definition.prefixes:
+            options += f", prefix='{self.index_definition.prefixes}'"
+        return f"CREATE VIRTUAL TABLE {self.table} USING fts5({', '.join(self.columns)}, {options})"
+
+    def setup(self, connection):
+        existing = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.table}
+        ).scalar()
+        words_ready = not self.index_definition.substring or connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.words_table}
+        ).scalar() is not None
+        if existing == self.create_sql() and words_ready:
+            return
+
+        # структура индекса изменилась - пересоздаём
+        if existing is not None:
+            connection.execute(text(f'DROP TABLE {self.table}'))
+        connection.execute(text(self.create_sql()))
+        if self.index_definition.substring:
+            connection.execute(text(f'DROP TABLE IF EXISTS {self.words_table}'))
+            connection.execute(text(self.create_words_sql()))
+            connection.execute(text(f'CREATE INDEX ix_{self.words_table}_doc ON {self.words_table} (doc_id)'))
+        self.rebuild(connection)
+
+    def rebuild(self, connection):
+        definition = self.index_definition
+        columns = ', '.join(definition.fields)
+        connection.execute(text(f'DELETE FROM {self.table}'))
+
+        if definition.extra_columns:
+            self._rebuild_from_objects(connection)
+            return
+
+        # та же нормализация, что и в _document(), но одним INSERT ... SELECT
+        if definition.substring:
+            values = ', '.join(f"normalize_text({field})" for field in definition.fields)
+        else:
+            values = ', '.join(
+                f"replace(replace(COALESCE({field}, ''), 'ё', 'е'), 'Ё', 'Е')" for field in definition.fields
+            )
+        where = f'WHERE {definition.condition}' if definition.condition else ''
+        connection.execute(text(
+            f'INSERT INTO {self.table} (rowid, {columns}) '
+            f'SELECT id, {values} FROM {definition.model.__tablename__} {where}'
+        ))
+        if definition.substring:
+            self._rebuild_words(connection)
+
+    def _rebuild_words(self, connection, batch_size=5000):
+        """Начала слов - по уже приведённому тексту индекса"""
+        connection.execute(text(f'DELETE FROM {self.words_table}'))
+        rows = connection.execute(text(f"SELECT rowid, {', '.join(self.index_definition.fields)} FROM {self.table}"))
+        batch = []
+        for row in rows:
+            batch.extend(self._word_rows(row[0], row[1:]))
+            if len(batch) >= batch_size:
+                connection.execute(self._insert_words_statement(), batch)
+                batch = []
+        if batch:
+            connection.execute(self._insert_words_statement(), batch)
+
+    @staticmethod
+    def _word_rows(doc_id, values):
+        prefixes = {word[:SHORT_PREFIX] for value in values for word in WORD_RE.findall(value or '')}
+        return [{'prefix': prefix, 'doc_id': doc_id} for prefix in prefixes]
+
+    def _insert_words_statement(self):
+        return text(f'INSERT INTO {self.words_table} (prefix, doc_id) VALUES (:prefix, :doc_id)')
+
+    def _rebuild_from_objects(self, connection, batch_size=1000):
+        """Перестроение для индексов с вычисляемыми столбцами - пачками через executemany"""
+        definition = self.index_definition
+        model = definition.model
+        # читаем через то же соединение, в котором пишем индекс
+        with Session(bind=connection) as session:
+            statement = select(model).options(
+                load_only(*[getattr(model, field) for field in definition.fields])
+            )
+            statement = definition.filter(statement).execution_options(yield_per=batch_size)
+
+            batch = []
+            for obj in session.scalars(statement):
+                if definition.is_indexed(obj):
+                    batch.append(self._document(obj))
+                if len(batch) >= batch_size:
+                    connection.execute(self._insert_statement(), batch)
+                    batch = []
+            if batch:
+                connection.execute(self._insert_statement(), batch)
+
+    def _insert_statement(self):
+        columns = ', '.join(self.columns)
+        placeholders = ', '.join(f':{column}' for column in self.columns)
+        return text(f'INSERT INTO {self.table} (rowid, {columns}) VALUES (:id, {placeholders})')
+
+    def _document(self, obj):
+        document = {'id': obj.id}
+        normalize = normalize_text if self.index_definition.substring else fold_yo
+        for field in self.index_definition.fields:
+            document[field] = normalize(getattr(obj, field) or '')
+        document.update(self.index_definition.extra_values(obj))
+        return document
+
+    def index(self, connection, obj):
+        self.remove(connection, obj.id)
+        if not self.index_definition.is_indexed(obj):
+            return
+        document = self._document(obj)
+        connection.execute(self._insert_statement(), document)
+        if self.index_definition.substring:
+            rows = self._word_rows(obj.id, [document[field] for field in self.index_definition.fields])
+            if rows:
+                connection.execute(self._insert_words_statement(), rows)
+
+    def remove(self, connection, obj_id):
+        connection.execute(text(f'DELETE FROM {self.table} WHERE rowid = :id'), {'id': obj_id})
+        if self.index_definition.substring:
+            connection.execute(text(f'DELETE FROM {self.words_table} WHERE doc_id = :id'), {'id': obj_id})
+
+    @staticmethod
+    def substring_terms(query):
+        """
+        Слова запроса для индекса триграмм: (слова от 3 символов - для MATCH, короче - начала слов:
+        из них нельзя составить триграмму, они ищутся по таблице начал слов)
+        """
+        words = [normalize_text(word) for word in (query or '').split()]
+        short = [part for word in words if len(word) < 3 for part in WORD_RE.findall(word)]
+        return [word for word in words if len(word) >= 3], short
+
+    def build_match_query(self, query):
+        """Превратить пользовательский запрос в выражение MATCH: все слова по префиксу основы"""
+        if self.index_definition.substring:
+            words, _ = self.substring_terms(query)
+            return ' AND '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+        return ' AND '.join(f'"{term}"*' for term in search_terms(query, self.stemming))
+
+    def short_word_ids(self, short_words):
+        """Подзапрос id записей, в которых есть слова, начинающиеся с каждого из коротких слов"""
+        words = table(self.words_table, column('prefix'), column('doc_id'))
+        queries = [select(words.c.doc_id).where(words.c.prefix >= word, words.c.prefix < word + '\uffff')
+                   for word in short_words]
+        return intersect(*queries) if len(queries) > 1 else queries[0].distinct()
+
+    def _filtered(self, statement, match, skills=None, match_all=True, short_words=(), rowid=None):
+        rowid = literal_column('rowid') if rowid is None else rowid
+        if match:
+            statement = statement.where(literal_column(self.table).op('MATCH')(match))
+            if short_words:
+                # "+rowid" - проверка по готовому списку id; без "+" FTS5 выполняет MATCH заново для каждого id
+                statement = statement.where(literal_column('+rowid').in_(self.short_word_ids(short_words)))
+        skill_ids = self.index_definition.skill_filter(skills, match_all)
+        if skill_ids is not None:
+            statement = statement.where(rowid.in_(skill_ids))
+        return statement
+
+    def _short_words(self, query):
+        return self.substring_terms(query)[1] if self.index_definition.substring else ()
+
+    def search(self, query, limit, after=None, skills=None, match_all=True):
+        match = self.build_match_query(query)
+        short_words = self._short_words(query)
+        if not match and not short_words:
+            return []
+
+        definition = self.index_definition
+        if match:
+            rowid = literal_column('rowid')
+            weights = ', '.join(str(w) for w in definition.weights)
+            score = literal_column(f'bm25({self.table}, {weights})')
+            snippet = func.snippet(literal_column(self.table), definition.snippet_column,
+                                   SNIPPET_START, SNIPPET_END, '…', 24)
+            source = table(self.table)
+        else:
+            # только короткие слова - по таблице начал слов, без обращения к индексу; ранжировать нечем, порядок по id
+            source = self.short_word_ids(short_words).subquery()
+            rowid = source.c.doc_id
+            score = literal_column('0.0')
+            snippet = literal_column('NULL')
+
+        statement = select(rowid, snippet, score.label('score')).select_from(source)
+        statement = self._filtered(statement, match, skills, match_all, short_words, rowid=rowid)
+        if after is not None:
+            after_score, after_id = float(after[0]), int(after[1])
+            statement = statement.where(db.or_(
+                score > after_score,
+                db.and_(score == after_score, rowid > after_id)
+            ))
+        statement = statement.order_by(literal_column('score'), rowid).limit(limit)
+
+        rows = db.session.execute(statement)
+        return [(row[0], row[1], (row[2], row[0])) for row in rows]
+
+    def matching_ids(self, query, skills=None, match_all=True):
+        short_words = self._short_words(query)
+        match = self.build_match_query(query)
+        if not match and short_words:
+            source = self.short_word_ids(short_words).subquery()
+            return self._filtered(select(source.c.doc_id), match, skills, match_all, short_words, rowid=source.c.doc_id)
+        statement = select(literal_column('rowid')).select_from(table(self.table))
+        return self._filtered(statement, match or '""', skills, match_all, short_words)
+
+
+class LikeSearch(SearchBackend):
+    """
+    Поиск без индекса (LIKE), используется если FTS5 недоступен
+    """
+    name = 'like'
+
+    def _query(self, query, columns, skills=None, match_all=True):
+        definition = self.index_definition
+        model = definition.model
+        found = db.session.query(*columns)
+        if query:
+            found = found.filter(
+                db.or_(*[contains_text(getattr(model, field), query) for field in definition.fields])
+            )
+        skill_ids = definition.skill_filter(skills, match_all)
+        if skill_ids is not None:
+            found = found.filter(model.id.in_(skill_ids))
+        return definition.filter(found)
+
+    def search(self, query, limit, after=None, skills=None, match_all=True):
+        model = self.index_definition.model
+        rows = self._query(query, (model.id, model.created_at), skills, match_all)
+        if after is not None:
+            created_at, obj_id = datetime.fromisoformat(after[0]), int(after[1])
+            rows = rows.filter(db.or_(
+                model.created_at < created_at,
+                db.and_(model.created_at == created_at, model.id < obj_id)
+            ))
+        rows = rows.order_by(model.created_at.desc(), model.id.desc()).limit(limit)
+        return [(row.id, None, (row.created_at, row.id)) for row in rows]
+
+    def matching_ids(self, query, skills=None, match_all=True):
+        return self._query(query, (self.index_definition.model.id,), skills, match_all).subquery().select()
+
+
+class SearchService:
+    """
+    Методы:
+    - Выбрать и подготовить поисковые индексы при старте приложения
+    - Найти записи по запросу (с ранжированием и фрагментами)
+    - Получить подзапрос id найденных записей
+    - Перестроить индекс
+    """
+    backends = {
+        SqliteFtsSearch.name: SqliteFtsSearch,
+        LikeSearch.name: LikeSearch
+    }
+
+    indexes = {
+        index.name: index
+        for index in (VacancyIndex(), ResumeIndex(), UserIndex())
+    }
+
+    active = {}
+
+    @classmethod
+    def init_app(cls, app):
+        """
+        Выбирает реализацию по настройке SEARCH_BACKEND ('auto', 'fts5', 'like')
+        """
+        name = app.config.get('SEARCH_BACKEND', 'auto')
+        stemming = app.config.get('SEARCH_STEMMING', True)
+
+        with db.engine.begin() as connection:
+            if name == 'auto':
+                if db.engine.dialect.name == 'sqlite' and SqliteFtsSearch.is_available(connection):
+                    name = SqliteFtsSearch.name
+                else:
+                    name = LikeSearch.name
+
+            cls.active = {}
+            for index_name, index in cls.indexes.items():
+                backend_name = name
+                if (name == SqliteFtsSearch.name and index.tokenizer.startswith('trigram')
+                        and not SqliteFtsSearch.supports_tokenizer(connection, index.tokenizer)):
+                    backend_name = LikeSearch.name
+                backend = cls.backends[backend_name](index, stemming=stemming)
+                backend.setup(connection)
+                cls.active[index_name] = backend
+
+    @classmethod
+    def search(cls, index_name, query, per_page, cursor=None, **filters):
+        """
+        Найти записи индекса index_name
+        filters - дополнительные условия индекса (skills, match_all для резюме)
+        Возвращает страницу записей (KeysetPage) в порядке релевантности
+        и словарь {id записи: фрагмент с подсветкой}
+        """
+        backend = cls.active[index_name]
+        after = decode_cursor(cursor)
+        try:
+            hits = backend.search(query, per_page + 1, after=after, **filters)
+        except (IndexError, TypeError, ValueError):
+            after = None
+            hits = backend.search(query, per_page + 1, **filters)
+
+        next_cursor = None
+        if len(hits) > per_page:
+            hits = hits[:per_page]
+            next_cursor = encode_cursor(*hits[-1][2])
+
+        model = cls.indexes[index_name].model
+        found = {}
+        if hits:
+            found = {obj.id: obj for obj in model.query.filter(model.id.in_([h[0] for h in hits]))}
+
+        items = [found[obj_id] for obj_id, _, _ in hits if obj_id in found]
+        snippets = {
+            obj_id: highlight_snippet(snippet)
+            for obj_id, snippet, _ in hits
+            if snippet and obj_id in found
+        }
+        page = KeysetPage(items, cursor=cursor if after is not None else None, next_cursor=next_cursor)
+        return page, snippets
+
+    @classmethod
+    def matching_ids(cls, index_name, query, **filters):
+        """
+        Подзапрос id записей, подходящих под запрос:
+        Resume.query.filter(Resume.id.in_(SearchService.matching_ids('resumes', q)))
+        """
+        return cls.active[index_name].matching_ids(query, **filters)
+
+    @classmethod
+    def count(cls, index_name, query, limit=1000, **filters):
+        """
+        Количество найденных записей, но не больше limit
+        Возвращает (количество, True - если совпадений больше limit)
+        """
+        found = cls.matching_ids(index_name, query, **filters).limit(limit + 1).subquery()
+        total = db.session.execute(select(func.count()).select_from(found)).scalar()
+        return min(total, limit), total > limit
+
+    @classmethod
+    def rebuild(cls, index_name=None):
+        with db.engine.begin() as connection:
+            for name, backend in cls.active.items():
+                if index_name is None or name == index_name:
+                    backend.rebuild(connection)
+
+
+def _register_index_events(index):
+    def index_obj(mapper, connection, target):
+        backend = SearchService.active.get(index.name)
+        if backend is not None:
+            backend.index(connection, target)
+
+    def remove_obj(mapper, connection, target):
+        backend = SearchService.active.get(index.name)
+        if backend is not None:
+            backend.remove(connection, target.id)
+
+    event.listen(index.model, 'after_insert', index_obj, propagate=True)
+    event.listen(index.model, 'after_update', index_obj, propagate=True)
+    event.listen(index.model, 'after_delete', remove_obj, propagate=True)
+
+
+for _index in SearchService.indexes.values():
+    _register_index_events(_index)
@@ -0,0 +1,136 @@
+"""
+Профилирование SQL по запросам (события движка SQLAlchemy)
+Для каждого HTTP-запроса считается количество SQL-запросов, суммарное время в БД
+и сколько раз повторялся запрос одной формы (тот же текст, списки IN (?, ?, ...) свёрнуты).
+Если форма повторилась больше SQL_REPEAT_THRESHOLD раз - это похоже на N+1,
+в лог пишется предупреждение с эндпоинтом и текстом запроса.
+
+Результат:
+- в режиме отладки и тестов - заголовки ответа X-SQL-Queries, X-SQL-Time-Ms, X-SQL-Repeated
+- иначе - одна JSON-строка на запрос в логгер sql_profiler (уровень INFO, при N+1 - WARNING);
+  обработчики и уровень логгера задаёт настройка логирования приложения
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import event
+
+logger = logging.getLogger('sql_profiler')
+
+# списки параметров IN (?, ?, ?) разной длины - одна форма запроса
+PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+SPACES = re.compile(r'\s+')
+
+# сколько повторяющихся форм выводить в лог
+REPORTED_SHAPES = 5
+
+
+def statement_shape(statement):
+    """Форма запроса: текст без лишних пробелов, списки параметров свёрнуты до (?)"""
+    return PLACEHOLDER_LIST.sub('(?)', SPACES.sub(' ', statement).strip())
+
+
+class RequestQueries:
+    """
+    SQL-запросы одного HTTP-запроса
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def add(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Формы, повторившиеся больше threshold раз: [(форма, количество)]"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+class SqlProfiler:
+    """
+    Методы:
+    - Подключить профилирование к приложению
+    - Статистика SQL текущего запроса
+    """
+    enabled = True
+    threshold = 10
+    # None - заголовки только в режиме отладки и тестов
+    headers = None
+
+    @classmethod
+    def init_app(cls, app):
+        cls.enabled = app.config.get('SQL_PROFILING', True)
+        cls.threshold = app.config.get('SQL_REPEAT_THRESHOLD', 10)
+        cls.headers = app.config.get('SQL_PROFILE_HEADERS')
+        if not cls.enabled:
+            return
+
+        from database import db
+        _register_engine_events(db.engine)
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+
+    @staticmethod
+    def current():
+        """Статистика SQL текущего HTTP-запроса (None вне запроса или если профилирование выключено)"""
+        return g.get('sql_queries') if has_request_context() else None
+
+
+def _register_engine_events(engine):
+    if event.contains(engine, 'before_cursor_execute', _before_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_execute)
+    event.listen(engine, 'after_cursor_execute', _after_execute)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.sql_profiler_start = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = SqlProfiler.current()
+    if queries is not None:
+        started = getattr(context, 'sql_profiler_start', None)
+        queries.add(statement, time.perf_counter() - started if started is not None else 0.0)
+
+
+def _start_request():
+    g.sql_queries = RequestQueries()
+
+
+def _finish_request(response):
+    queries = g.get('sql_queries')
+    if queries is None:
+        return response
+
+    repeated = queries.repeated(SqlProfiler.threshold)
+    duration_ms = round(queries.duration * 1000, 2)
+    headers = SqlProfiler.headers
+    if headers is None:
+        headers = current_app.debug or current_app.testing
+
+    if headers:
+        for shape, count in repeated[:REPORTED_SHAPES]:
+            logger.warning(f"Possible N+1 in {request.endpoint}: {count} x {shape[:300]}")
+        response.headers['X-SQL-Queries'] = str(queries.count)
+        response.headers['X-SQL-Time-Ms'] = str(duration_ms)
+        response.headers['X-SQL-Repeated'] = str(len(repeated))
+    else:
+        logger.log(logging.WARNING if repeated else logging.INFO, json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'queries': queries.count,
+            'db_ms': duration_ms,
+            'repeated': [{'count': count, 'statement': shape[:300]} for shape, count in repeated[:REPORTED_SHAPES]]
+        }, ensure_ascii=False))
+    return response
@@ -0,0 +1,297 @@
+"""
+Сервис статистики платформы для отчётов администратора
+Итоги (platform_stats) и сводки по дням (daily_stats) обновляются при каждой записи пользователей,
+резюме, вакансий и откликов: события моделей копят изменения в session.info, после flush
+они применяются одним upsert на метрику в той же транзакции, что и сами записи.
+Отчёты читают несколько строк итогов и не больше 31 строки на метрику за последний месяц.
+
+Ряды по дням (daily_stats), день - дата по UTC:
+- users, resumes, vacancies, applications - сколько существующих записей создано в этот день,
+  users:<роль>, vacancies:<статус>, applications:<статус> - то же с разбивкой по текущему значению
+- vacancies_published - сколько существующих вакансий впервые опубликовано в этот день
+Ряды за произвольный период по дням, неделям или месяцам отдаёт series() (JSON: /admin/api/stats)
+
+Пересчитать всё по исходным таблицам (первый запуск, периодическая сверка по cron):
+flask --app app rebuild-stats
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import Date, and_, cast, event, inspect, insert, select, delete, func, type_coerce, update
+from sqlalchemy.orm import Session, object_session
+from database import db
+from models.user import User
+from models.resume import Resume
+from models.vacancy import Vacancy
+from models.application import Application
+from models.statistics import PlatformStat, DailyStat
+
+PENDING_KEY = 'stats_pending'
+
+# модель -> (метрика, поля, по значениям которых ведутся отдельные итоги,
+#           ряды по дням: {ряд: поле с датой}; ряд с именем метрики - по дате создания, с разбивкой по полям)
+TRACKED = {
+    User: ('users', ('role', 'is_blocked'), {'users': 'created_at'}),
+    Resume: ('resumes', (), {'resumes': 'created_at'}),
+    Vacancy: ('vacancies', ('status',), {'vacancies': 'created_at', 'vacancies_published': 'published_at'}),
+    Application: ('applications', ('status',), {'applications': 'created_at'}),
+}
+
+SERIES = {name for _, _, series in TRACKED.values() for name in series}
+
+INTERVALS = ('day', 'week', 'month')
+
+# наибольшая длина запрашиваемого периода, дней
+MAX_SERIES_DAYS = 3660
+
+
+def metric_keys(metric, values):
+    """
+    Итоговые метрики, в которые входит запись:
+    метрика модели и по одной на значение поля, например 'vacancies:published', 'users:blocked'
+    """
+    keys = [metric]
+    for field, value in values.items():
+        if field == 'is_blocked':
+            if value:
+                keys.append(f'{metric}:blocked')
+        elif value is not None:
+            keys.append(f'{metric}:{value}')
+    return keys
+
+
+def contribution(metric, values, dates):
+    """
+    Вклад записи в статистику: {(метрика, день или None для итога): количество}
+    values - значения полей разбивки, dates - {ряд: дата или None}
+    """
+    keys = metric_keys(metric, values)
+    result = Counter({(key, None): 1 for key in keys})
+    for name, moment in dates.items():
+        if moment is not None:
+            for key in (keys if name == metric else [name]):
+                result[(key, moment.date())] += 1
+    return result
+
+
+def day_of(column):
+    """Дата (без времени) столбца datetime как date"""
+    if db.engine.dialect.name == 'sqlite':
+        # в SQLite нет типа даты: date() возвращает строку 'YYYY-MM-DD', type_coerce разбирает её как Date
+        return type_coerce(func.date(column), Date)
+    return cast(column, Date)
+
+
+def upsert_add(connection, table, rows, keys):
+    """
+    Прибавить value строк rows к строкам таблицы с теми же ключами keys (недостающие строки вставляются)
+    SQLite и PostgreSQL - одним INSERT ... ON CONFLICT DO UPDATE, другие СУБД - UPDATE, затем INSERT
+    """
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=keys, set_={'value': table.c.value + statement.excluded.value}
+        ), rows)
+        return
+
+    for row in rows:
+        updated = connection.execute(
+            update(table)
+            .where(and_(*[table.c[key] == row[key] for key in keys]))
+            .values(value=table.c.value + row['value'])
+        )
+        if updated.rowcount == 0:
+            connection.execute(insert(table), row)
+
+
+def bucket_start(day, interval):
+    """Первый день интервала (день, неделя с понедельника, месяц), в который попадает day"""
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+class StatsService:
+    """
+    Методы:
+    - Итоги по всем метрикам
+    - Сумма метрик по дням за период
+    - Отчёт для панели и страницы отчётов администратора
+    - Пересчитать статистику по исходным таблицам
+    """
+
+    @staticmethod
+    def totals():
+        """Итоги по всем метрикам: {метрика: значение}"""
+        return dict(db.session.execute(select(PlatformStat.metric, PlatformStat.value)).all())
+
+    @staticmethod
+    def daily_sums(metrics, since):
+        """Сумма значений метрик за дни начиная с since: {метрика: значение}"""
+        sums = dict(db.session.execute(
+            select(DailyStat.metric, func.sum(DailyStat.value))
+            .where(DailyStat.metric.in_(metrics), DailyStat.day >= since)
+            .group_by(DailyStat.metric)
+        ).all())
+        return {metric: sums.get(metric) or 0 for metric in metrics}
+
+    @classmethod
+    def basic_report(cls, totals=None):
+        """Общие итоги (просмотретьОтчёты())"""
+        totals = cls.totals() if totals is None else totals
+        return {
+            'total_users': totals.get('users', 0),
+            'total_applicants': totals.get('users:applicant', 0),
+            'total_employers': totals.get('users:employer', 0),
+            'total_resumes': totals.get('resumes', 0),
+            'total_vacancies': totals.get('vacancies', 0),
+            'total_applications': totals.get('applications', 0),
+            'blocked_users': totals.get('users:blocked', 0)
+        }
+
+    @classmethod
+    def detailed_report(cls, days=30, totals=None):
+        """Новые записи за последние days дней и итоги по статусам"""
+        totals = cls.totals() if totals is None else totals
+        since = (datetime.utcnow() - timedelta(days=days)).date()
+        new = cls.daily_sums([metric for metric, _, _ in TRACKED.values()], since)
+        return {
+            'new_users_last_month': new['users'],
+            'new_resumes_last_month': new['resumes'],
+            'new_vacancies_last_month': new['vacancies'],
+            'new_applications_last_month': new['applications'],
+            'published_vacancies': totals.get('vacancies:published', 0),
+            'closed_vacancies': totals.get('vacancies:closed', 0),
+            'pending_applications': totals.get('applications:pending', 0),
+        }
+
+    @staticmethod
+    def series(metrics, start, end, interval='day'):
+        """
+        Ряды метрик за дни [start, end] по дням, неделям или месяцам, пропущенные интервалы - нули
+        Возвращает (начала интервалов, {метрика: значения})
+        """
+        labels = list(dict.fromkeys(
+            bucket_start(start + timedelta(days=offset), interval) for offset in range((end - start).days + 1)
+        ))
+        values = {metric: dict.fromkeys(labels, 0) for metric in metrics}
+        rows = db.session.execute(
+            select(DailyStat.metric, DailyStat.day, DailyStat.value)
+            .where(DailyStat.metric.in_(metrics), DailyStat.day.between(start, end))
+        )
+        for metric, day, value in rows:
+            values[metric][bucket_start(day, interval)] += value
+        return labels, {metric: list(points.values()) for metric, points in values.items()}
+
+    @staticmethod
+    def apply(connection, delta):
+        """Прибавить изменения {(метрика, день или None): количество} к таблицам статистики"""
+        totals = [{'metric': metric, 'value': value}
+                  for (metric, day), value in delta.items() if day is None and value]
+        daily = [{'metric': metric, 'day': day, 'value': value}
+                 for (metric, day), value in delta.items() if day is not None and value]
+        for table, rows, keys in ((PlatformStat.__table__, totals, ['metric']),
+                                  (DailyStat.__table__, daily, ['metric', 'day'])):
+            if rows:
+                upsert_add(connection, table, rows, keys)
+
+    @staticmethod
+    def rebuild():
+        """
+        Пересчитать итоги и сводки по дням по исходным таблицам
+        Возвращает итоги по моделям: {метрика: количество записей}
+        """
+        delta = Counter()
+        for model, (metric, fields, series) in TRACKED.items():
+            table = model.__table__
+            columns = [table.c[field] for field in fields]
+            day = day_of(table.c.created_at)
+            for row in db.session.execute(select(day, *columns, func.count()).group_by(day, *columns)):
+                created, values, count = row[0], dict(zip(fields, row[1:-1])), row[-1]
+                keys = metric_keys(metric, values)
+                for key in keys:
+                    delta[(key, None)] += count
+                    if created is not None:
+                        delta[(key, created)] += count
+
+            for name, field in series.items():
+                if name == metric:
+                    continue
+                day = day_of(table.c[field])
+                for created, count in db.session.execute(
+                        select(day, func.count()).where(table.c[field].isnot(None)).group_by(day)):
+                    delta[(name, created)] += count
+
+        db.session.execute(delete(PlatformStat))
+        db.session.execute(delete(DailyStat))
+        StatsService.apply(db.session.connection(), delta)
+        db.session.commit()
+        return {metric: delta[(metric, None)] for metric, _, _ in TRACKED.values()}
+
+
+def _value(target, field, previous=False):
+    """Значение поля записи; previous - до изменения в текущем flush"""
+    history = inspect(target).attrs[field].history
+    if previous and history.has_changes():
+        return history.deleted[0] if history.deleted else None
+    return getattr(target, field)
+
+
+def _values(target, fields, previous=False):
+    return {field: _value(target, field, previous) for field in fields}
+
+
+def _dates(target, series, previous=False):
+    return {name: _value(target, field, previous) for name, field in series.items()}
+
+
+def _queue(target, delta):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(PENDING_KEY, Counter()).update(delta)
+
+
+def _register_stats_events(model, metric, fields, series):
+    watched = fields + tuple(series.values())
+
+    def inserted(mapper, connection, target):
+        _queue(target, contribution(metric, _values(target, fields), _dates(target, series)))
+
+    def updated(mapper, connection, target):
+        attrs = inspect(target).attrs
+        if any(attrs[field].history.has_changes() for field in watched):
+            delta = contribution(metric, _values(target, fields), _dates(target, series))
+            delta.subtract(contribution(metric, _values(target, fields, previous=True),
+                                        _dates(target, series, previous=True)))
+            _queue(target, delta)
+
+    def deleted(mapper, connection, target):
+        delta = Counter()
+        delta.subtract(contribution(metric, _values(target, fields), _dates(target, series)))
+        _queue(target, delta)
+
+    event.listen(model, 'after_insert', inserted, propagate=True)
+    event.listen(model, 'after_update', updated, propagate=True)
+    event.listen(model, 'after_delete', deleted, propagate=True)
+
+
+for _model, (_metric, _fields, _series) in TRACKED.items():
+    _register_stats_events(_model, _metric, _fields, _series)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_after_flush(session, flush_context):
+    delta = session.info.pop(PENDING_KEY, None)
+    if delta:
+        StatsService.apply(session.connection(), delta)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,192 @@
+"""
+Нормализация текста для поиска
+- приведение регистра с учётом Unicode (casefold), а не только ASCII как в LIKE SQLite
+- замена ё на е
+- стемминг русских слов (встроенная реализация алгоритма Snowball для русского языка)
+"""
+import re
+from functools import lru_cache
+
+WORD_RE = re.compile(r'\w+')
+
+# символы, которые различают навыки ("C++", "C#", ".NET"), заменяются словами до разбиения на слова
+SKILL_SYMBOLS = (
+    (re.compile(r'(?<=\w)\+\+'), 'pp'),
+    (re.compile(r'(?<=\w)#'), 'sharp'),
+    (re.compile(r'(?<![\w.])\.(?=[^\W\d])'), 'dot'),
+)
+
+
+def fold_yo(value):
+    """Заменить ё на е. Длина строки не меняется, поэтому фрагменты поиска остаются точными"""
+    return value.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def normalize_text(value):
+    """Привести текст к виду для поиска: casefold + ё→е"""
+    if not value:
+        return ''
+    return fold_yo(value.casefold())
+
+
+def tokenize(value):
+    """Разбить текст на нормализованные слова"""
+    return WORD_RE.findall(normalize_text(value))
+
+
+def skill_words(skill):
+    """Слова навыка: "C++" -> ["cpp"], "C#" -> ["csharp"], ".NET Core" -> ["dotnet", "core"]"""
+    value = normalize_text(skill)
+    for pattern, replacement in SKILL_SYMBOLS:
+        value = pattern.sub(replacement, value)
+    return WORD_RE.findall(value)
+
+
+def skill_token(skill):
+    """Навык одним токеном: "Django/Flask" -> "django_flask", "CI/CD" -> "ci_cd", "C++" -> "cpp\""""
+    return '_'.join(skill_words(skill))
+
+
+class RussianStemmer:
+    """
+    Стеммер Snowball для русского языка (https://snowballstem.org/algorithms/russian/stemmer.html)
+    Слова без русских гласных (латиница, числа) возвращаются без изменений
+    """
+    VOWELS = 'аеиоуыэюя'
+
+    PERFECTIVE_GERUND_1 = ('вшись', 'вши', 'в')
+    PERFECTIVE_GERUND_2 = ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв')
+
+    ADJECTIVE = ('ими', 'ыми', 'его', 'ого', 'ему', 'ому',
+                 'ее', 'ие', 'ые', 'ое', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+                 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+
+    PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+    PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+
+    REFLEXIVE = ('ся', 'сь')
+
+    VERB_1 = ('ете', 'йте', 'ешь', 'нно',
+              'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет', 'ют', 'ны', 'ть',
+              'й', 'л', 'н')
+    VERB_2 = ('ейте', 'уйте',
+              'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло', 'ено', 'ует', 'уют',
+              'ены', 'ить', 'ыть', 'ишь',
+              'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую',
+              'ю')
+
+    NOUN = ('иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях',
+            'ев', 'ов', 'ие', 'ье', 'еи', 'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом',
+            'ах', 'ях', 'ию', 'ью', 'ия', 'ья',
+            'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю', 'я')
+
+    SUPERLATIVE = ('ейше', 'ейш')
+    DERIVATIONAL = ('ость', 'ост')
+
+    def _regions(self, word):
+        """Вернуть начала областей RV и R2"""
+        rv = r1 = r2 = len(word)
+        for i, char in enumerate(word):
+            if char in self.VOWELS:
+                rv = i + 1
+                break
+        for i in range(1, len(word)):
+            if word[i] not in self.VOWELS and word[i - 1] in self.VOWELS:
+                r1 = i + 1
+                break
+        for i in range(r1 + 1, len(word)):
+            if word[i] not in self.VOWELS and word[i - 1] in self.VOWELS:
+                r2 = i + 1
+                break
+        return rv, r2
+
+    @staticmethod
+    def _strip(word, start, endings, after_a_ya=False):
+        """
+        Удалить самое длинное из окончаний, лежащее в области [start:]
+        after_a_ya - окончание должно стоять после а/я (сама буква не удаляется)
+        Возвращает None, если ни одно окончание не подошло
+        """
+        for ending in sorted(endings, key=len, reverse=True):
+            if not word.endswith(ending):
+                continue
+            position = len(word) - len(ending)
+            if position < start:
+                continue
+            if after_a_ya and (position - 1 < start or word[position - 1] not in 'ая'):
+                continue
+            return word[:position]
+        return None
+
+    def _adjectival(self, word, rv):
+        stripped = self._strip(word, rv, self.ADJECTIVE)
+        if stripped is None:
+            return None
+        participle = self._strip(stripped, rv, self.PARTICIPLE_1, after_a_ya=True)
+        if participle is None:
+            participle = self._strip(stripped, rv, self.PARTICIPLE_2)
+        return participle if participle is not None else stripped
+
+    def _verb(self, word, rv):
+        stripped = self._strip(word, rv, self.VERB_1, after_a_ya=True)
+        if stripped is None:
+            stripped = self._strip(word, rv, self.VERB_2)
+        return stripped
+
+    def stem(self, word):
+        word = fold_yo(word.lower())
+        rv, r2 = self._regions(word)
+        if rv >= len(word):
+            return word
+
+        # шаг 1
+        stripped = self._strip(word, rv, self.PERFECTIVE_GERUND_1, after_a_ya=True)
+        if stripped is None:
+            stripped = self._strip(word, rv, self.PERFECTIVE_GERUND_2)
+        if stripped is not None:
+            word = stripped
+        else:
+            word = self._strip(word, rv, self.REFLEXIVE) or word
+            for step in (self._adjectival, self._verb):
+                stripped = step(word, rv)
+                if stripped is not None:
+                    word = stripped
+                    break
+            else:
+                word = self._strip(word, rv, self.NOUN) or word
+
+        # шаг 2
+        if word.endswith('и') and len(word) - 1 >= rv:
+            word = word[:-1]
+
+        # шаг 3
+        word = self._strip(word, r2, self.DERIVATIONAL) or word
+
+        # шаг 4
+        stripped = self._strip(word, rv, self.SUPERLATIVE)
+        if stripped is not None:
+            word = stripped
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+        elif stripped is None and word.endswith('ь') and len(word) - 1 >= rv:
+            word = word[:-1]
+
+        return word
+
+
+_stemmer = RussianStemmer()
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Основа слова. Слишком короткие основы не используются, чтобы не расширять префиксный поиск"""
+    stemmed = _stemmer.stem(word)
+    return stemmed if len(stemmed) >= 3 else word
+
+
+def search_terms(query, stemming=True):
+    """Слова поискового запроса (нормализованные и, при необходимости, приведённые к основе)"""
+    terms = tokenize(query)
+    if stemming:
+        terms = [stem(term) for term in terms]
+    return terms
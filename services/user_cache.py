@@ -0,0 +1,117 @@
+"""
+Кэш пользователей для login_manager.user_loader
+Хранит значения столбцов строки пользователя (вместе со счётчиком непрочитанных уведомлений) по id.
+На каждый запрос из них собирается объект нужного класса (Соискатель, Работодатель, Администратор)
+и добавляется в сессию как загруженный из БД - без SQL. Повторные Applicant.query.get(current_user.id)
+в том же запросе находят его в identity map сессии и тоже не обращаются к БД.
+
+Запись сбрасывается после коммита, изменившего строку пользователя (профиль, блокировка moderate_user(),
+удаление), и при изменении его уведомлений (NotificationService.invalidate).
+Кэш живёт в памяти процесса: в других процессах изменения становятся видны не позже чем через USER_CACHE_TTL
+"""
+import threading
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session, make_transient_to_detached, with_polymorphic
+from sqlalchemy.orm.attributes import instance_state, set_committed_value
+from database import db
+from models.user import User
+from services.search_cache import LRUCache
+
+CHANGED_KEY = 'users_changed'
+
+
+def _snapshot(user):
+    """Загруженные значения столбцов пользователя"""
+    loaded = instance_state(user).dict
+    return {attr.key: loaded[attr.key] for attr in instance_state(user).mapper.column_attrs if attr.key in loaded}
+
+
+class UserCache:
+    """
+    Методы:
+    - Загрузить пользователя (user_loader)
+    - Сбросить записи пользователей
+    - Статистика кэша
+    """
+    enabled = True
+    cache = LRUCache(max_size=10000, ttl=60)
+
+    # увеличивается при каждом сбросе: значения, прочитанные из БД до сброса, в кэш не попадают
+    _version = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def init_app(cls, app):
+        cls.enabled = app.config.get('USER_CACHE', True)
+        cls.cache = LRUCache(
+            max_size=app.config.get('USER_CACHE_SIZE', 10000),
+            ttl=app.config.get('USER_CACHE_TTL', 60)
+        )
+
+    @classmethod
+    def load(cls, user_id):
+        """
+        Пользователь по id, присоединённый к текущей сессии (None, если его нет)
+        """
+        user = db.session.identity_map.get(User.__mapper__.identity_key_from_primary_key((user_id,)))
+        if user is not None:
+            return user
+
+        if cls.enabled:
+            values = cls.cache.get(user_id)
+            mapper = User.__mapper__.polymorphic_map.get(values.get('type')) if values else None
+            if mapper is not None:
+                user = mapper.class_manager.new_instance()
+                for key, value in values.items():
+                    set_committed_value(user, key, value)
+                make_transient_to_detached(user)
+                db.session.add(user)
+                return user
+
+        # столбцы всех наследников сразу, чтобы снимок был полным (company_name работодателя и т.п.)
+        version = cls._version
+        users = with_polymorphic(User, '*')
+        user = db.session.execute(select(users).where(users.id == user_id)).scalar()
+        if user is not None and cls.enabled:
+            values = _snapshot(user)
+            with cls._lock:
+                if version == cls._version:
+                    cls.cache.set(user_id, values)
+        return user
+
+    @classmethod
+    def invalidate(cls, user_ids):
+        with cls._lock:
+            cls._version += 1
+            for user_id in user_ids:
+                cls.cache.pop(user_id)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._version += 1
+            cls.cache.clear()
+
+    @classmethod
+    def stats(cls):
+        return cls.cache.stats()
+
+
+@event.listens_for(User, 'after_update', propagate=True)
+@event.listens_for(User, 'after_delete', propagate=True)
+def _user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(CHANGED_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    user_ids = session.info.pop(CHANGED_KEY, None)
+    if user_ids:
+        UserCache.invalidate(user_ids)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop(CHANGED_KEY, None)
@@ -0,0 +1,40 @@
+"""
+Общие фикстуры тестов: приложение на временной БД SQLite с тестовыми данными create_test_data()
+"""
+import pytest
+from config import Config
+from app import create_app
+from database import db
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Создать приложение; именованные аргументы переопределяют настройки (SEARCH_BACKEND='like' и т.п.)"""
+    contexts = []
+
+    def make(**settings):
+        class TestConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+            TESTING = True
+            NOTIFICATIONS_WORKER = False
+            RECOMMENDATIONS_WORKER = False
+            PASSWORD_HASH_WORKERS = 0
+
+        for key, value in settings.items():
+            setattr(TestConfig, key, value)
+        app = create_app(TestConfig)
+        context = app.app_context()
+        context.push()
+        contexts.append(context)
+        return app
+
+    yield make
+    for context in reversed(contexts):
+        db.session.remove()
+        db.engine.dispose()
+        context.pop()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
@@ -0,0 +1,32 @@
+"""
+Автодополнение: ранжирование по частоте по всем терминам с этим началом
+"""
+from services.autocomplete_service import PrefixIndex
+
+
+def test_short_prefix_ranks_whole_range():
+    index = PrefixIndex([f'pa{i:05d}' for i in range(6000)] + ['python'] * 500 + ['pandas'] * 3)
+    assert [item['term'] for item in index.complete('p', 3)] == ['python', 'pandas', 'pa00000']
+    assert index.complete('p', 3) == index.complete('p', 3)
+    assert index.complete('py')[0] == {'term': 'python', 'count': 500}
+
+
+def test_updates_keep_top_terms_current():
+    index = PrefixIndex(['Python'] * 3 + ['PHP'] * 2 + ['Perl'])
+    assert [item['term'] for item in index.complete('p')] == ['Python', 'PHP', 'Perl']
+
+    for _ in range(5):
+        index.add('Perl')
+    index.remove('Python')
+    index.remove('Python')
+    assert [item['term'] for item in index.complete('p')] == ['Perl', 'PHP', 'Python']
+    assert [item['term'] for item in index.complete('pe')] == ['Perl']
+
+    index.remove('Python')
+    assert [item['term'] for item in index.complete('p')] == ['Perl', 'PHP']
+
+
+def test_every_word_is_a_prefix():
+    index = PrefixIndex(['Backend Developer', 'Frontend Developer', 'Frontend Developer'])
+    assert [item['term'] for item in index.complete('dev')] == ['Frontend Developer', 'Backend Developer']
+    assert index.complete('back') == [{'term': 'Backend Developer', 'count': 1}]
@@ -0,0 +1,31 @@
+"""
+Подбор резюме: матрица строится в фоновом потоке, страница вакансии её не ждёт
+"""
+import threading
+from models.vacancy import Vacancy
+from services import matching_service
+from services.matching_service import MatchingService
+
+
+def test_vacancy_page_does_not_build_matrix(app, monkeypatch):
+    MatchingService.resumes.wait_built()
+    MatchingService.resumes.reset(600)
+    release = threading.Event()
+    loads = []
+
+    def load_documents():
+        loads.append(threading.current_thread())
+        release.wait(5)
+        return matching_service._load_resumes()
+
+    monkeypatch.setattr(MatchingService.resumes, 'load_documents', load_documents)
+    vacancy = Vacancy.query.filter_by(title='Backend Developer').first()
+
+    # построение идёт в фоне: подбор пуст, повторный запрос не запускает второе построение
+    assert MatchingService.match_resumes(vacancy) == []
+    assert MatchingService.match_resumes(vacancy) == []
+    release.set()
+    MatchingService.resumes.wait_built()
+
+    assert len(loads) == 1 and loads[0] is not threading.current_thread()
+    assert [resume.title for resume, _ in MatchingService.match_resumes(vacancy)] == ['Backend Developer']
@@ -0,0 +1,25 @@
+"""
+Новые уведомления на открытых страницах (SSE / long-poll) включаются только настройкой NOTIFICATIONS_LIVE_UPDATES
+"""
+
+
+def login(client):
+    return client.post('/login', data={'email': 'applicant@example.com', 'password': '12345'})
+
+
+def test_live_updates_are_off_by_default(app):
+    client = app.test_client()
+    login(client)
+    page = client.get('/applicant/home').get_data(as_text=True)
+    assert 'EventSource' not in page and 'data-stream' not in page
+    assert client.get('/notifications/stream').status_code == 404
+    assert client.get('/notifications/poll').status_code == 404
+
+
+def test_live_updates_when_enabled(make_app):
+    app = make_app(NOTIFICATIONS_LIVE_UPDATES=True, NOTIFICATIONS_LONG_POLL_TIMEOUT=0)
+    client = app.test_client()
+    login(client)
+    page = client.get('/applicant/home').get_data(as_text=True)
+    assert 'EventSource' in page and 'data-stream="/notifications/stream"' in page
+    assert client.get('/notifications/poll').get_json()['notifications'] == []
@@ -0,0 +1,46 @@
+"""
+Пул хэширования паролей: при падении процессов пула хэш не считается в потоке запроса
+"""
+import os
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash
+from services.password_hasher import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture
+def hasher(make_app):
+    make_app(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=2, PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    yield PasswordHasher
+    with PasswordHasher._lock:
+        if PasswordHasher._pool is not None:
+            PasswordHasher._pool.shutdown(cancel_futures=True)
+            PasswordHasher._pool = None
+
+
+def break_pool():
+    pool = PasswordHasher._executor()
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result(timeout=30)
+    return pool
+
+
+def test_broken_pool_is_recreated(hasher):
+    broken = break_pool()
+    password_hash = hasher.hash('secret')
+    assert check_password_hash(password_hash, 'secret')
+    assert hasher._pool is not broken
+    assert hasher.stats()['pending'] == 0
+
+
+def test_pool_that_stays_broken_is_busy_not_inline(hasher, monkeypatch):
+    broken = break_pool()
+    monkeypatch.setattr('services.password_hasher._hash', lambda *args: pytest.fail('hashed in the request thread'))
+    monkeypatch.setattr(PasswordHasher, '_executor', classmethod(lambda cls: broken))
+
+    for _ in range(3):
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash('secret')
+    assert hasher.stats()['broken'] == 3
+    # места в допуске освобождены
+    assert all(hasher._slots.acquire(blocking=False) for _ in range(2))
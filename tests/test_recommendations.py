@@ -0,0 +1,67 @@
+"""
+Рекомендации вакансий: публикация вакансии не пересчитывает рекомендации в запросе страницы
+"""
+from database import db
+from models.recommendation import Recommendation
+from models.user import Applicant, Employer
+from models.vacancy import Vacancy
+from services.matching_service import MatchingService
+from services.recommendation_service import RecommendationService
+
+
+def publish(title, requirements):
+    employer = Employer.query.first()
+    vacancy = Vacancy(title=title, description='', requirements=requirements,
+                      employer_id=employer.id, status='published')
+    db.session.add(vacancy)
+    db.session.commit()
+    return vacancy
+
+
+def test_publish_before_matrix_is_built_queues_vacancy(app, monkeypatch):
+    monkeypatch.setattr(RecommendationService, 'worker', True)
+    RecommendationService.apply_published()
+    applicant = Applicant.query.first()
+    RecommendationService.refresh(applicant.id)
+    others = Recommendation(applicant_id=Employer.query.first().id)
+    db.session.add(others)
+    db.session.commit()
+
+    # новый процесс: матрица резюме ещё не построена
+    MatchingService.resumes.reset(600)
+    vacancy = publish('Python Developer', 'Python, Flask')
+    assert Recommendation.query.filter_by(stale=True).count() == 0
+    assert RecommendationService._published == {vacancy.id}
+
+    # страница отдаёт прежний список и ничего не пересчитывает
+    before = db.session.get(Recommendation, applicant.id).computed_at
+    RecommendationService.recommended_vacancies(applicant.id)
+    assert db.session.get(Recommendation, applicant.id).computed_at == before
+
+    # фоновый пересчёт: матрица строится, устаревает только строка владельца близкого резюме
+    assert RecommendationService.refresh_pending() == 1
+    db.session.expire_all()
+    recommendation = db.session.get(Recommendation, applicant.id)
+    assert recommendation.computed_at > before and not recommendation.stale
+    assert vacancy.id in recommendation.get_vacancy_ids()
+    assert db.session.get(Recommendation, others.applicant_id).vacancy_ids == ''
+
+
+def test_stale_row_is_served_while_worker_refreshes(app, monkeypatch):
+    monkeypatch.setattr(RecommendationService, 'worker', True)
+    RecommendationService.refresh_pending()
+    applicant = Applicant.query.first()
+    RecommendationService.refresh(applicant.id)
+    vacancy_ids = db.session.get(Recommendation, applicant.id).get_vacancy_ids()
+
+    publish('Backend Python Developer', 'Python, Django/Flask')
+    db.session.expire_all()
+    assert db.session.get(Recommendation, applicant.id).stale
+
+    shown = RecommendationService.recommended_vacancies(applicant.id, limit=10)
+    assert [vacancy.id for vacancy in shown] == vacancy_ids
+    assert db.session.get(Recommendation, applicant.id).stale
+
+    assert RecommendationService.refresh_pending() == 1
+    db.session.expire_all()
+    assert not db.session.get(Recommendation, applicant.id).stale
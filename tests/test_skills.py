@@ -0,0 +1,45 @@
+"""
+Справочник навыков: канонические имена и связи с резюме
+"""
+from database import db
+from models.resume import Resume
+from models.skill import Skill
+from models.user import Applicant
+
+
+def test_symbols_keep_skills_apart():
+    names = {raw: Skill.canonical_name(raw) for raw in ('C++', 'C#', 'C', 'F#', '.NET')}
+    assert names == {'C++': 'cpp', 'C#': 'csharp', 'C': 'c', 'F#': 'fsharp', '.NET': 'dotnet'}
+    assert Skill.canonical_name('Python 3.11+') == 'python'
+    assert Skill.canonical_name('Django/Flask') == 'django_flask'
+
+
+def test_cpp_and_csharp_resumes_are_separate(app):
+    applicant = Applicant.query.first()
+    for title, skills in (('Разработчик C++', 'C++, Qt'), ('Разработчик C#', 'C#, .NET'), ('Разработчик C', 'C')):
+        db.session.add(Resume(applicant_id=applicant.id, title=title, skills=skills))
+    db.session.commit()
+
+    def titles(skill):
+        return {resume.title for resume in Skill.resumes_with([skill])}
+
+    assert titles('C++') == {'Разработчик C++'}
+    assert titles('c#') == {'Разработчик C#'}
+    assert titles('C') == {'Разработчик C'}
+
+
+def test_backfill_splits_merged_skills(app):
+    applicant = Applicant.query.first()
+    db.session.add(Resume(applicant_id=applicant.id, title='Разработчик C#', skills='C#'))
+    db.session.commit()
+
+    # справочник, заполненный прежними правилами: "C#" слит с "C"
+    skill = Skill.query.filter_by(name='csharp').one()
+    skill.name = 'c'
+    db.session.commit()
+    assert Skill.stale_ids() == [skill.id]
+
+    Skill.backfill()
+    assert Skill.stale_ids() == []
+    assert [resume.title for resume in Skill.resumes_with(['C#'])] == ['Разработчик C#']
+    assert Skill.resumes_with(['C']).count() == 0
@@ -0,0 +1,19 @@
+"""
+Профилирование SQL: N+1 - запрос одной формы, повторённый больше SQL_REPEAT_THRESHOLD раз
+"""
+import logging
+from services.sql_profiler import RequestQueries, logger
+
+
+def test_repeated_counts_more_than_threshold():
+    queries = RequestQueries()
+    for resume_id in range(3):
+        queries.add(f'SELECT * FROM resumes WHERE id IN ({", ".join("?" * (resume_id + 2))})', 0.0)
+    queries.add('SELECT * FROM users', 0.0)
+
+    assert queries.repeated(3) == []
+    assert queries.repeated(2) == [('SELECT * FROM resumes WHERE id IN (?)', 3)]
+
+
+def test_logger_is_left_to_app_logging_config(app):
+    assert logger.handlers == [] and logger.propagate and logger.level == logging.NOTSET
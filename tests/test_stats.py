@@ -0,0 +1,35 @@
+"""
+Статистика платформы: инкрементальные итоги совпадают с пересчётом по исходным таблицам
+"""
+from datetime import date
+from sqlalchemy import select
+from database import db
+from models.statistics import DailyStat, PlatformStat
+from services.stats_service import StatsService, upsert_add
+
+
+def daily_stats():
+    return set(db.session.execute(select(DailyStat.metric, DailyStat.day, DailyStat.value)).all())
+
+
+def test_rebuild_matches_incremental(app):
+    totals, daily = StatsService.totals(), daily_stats()
+    assert totals['users'] == 4
+    assert all(isinstance(day, date) for _, day, _ in daily)
+
+    StatsService.rebuild()
+    assert StatsService.totals() == totals
+    assert daily_stats() == daily
+
+
+def test_upsert_without_on_conflict(app, monkeypatch):
+    connection = db.session.connection()
+    monkeypatch.setattr(connection.dialect, 'name', 'generic')
+    table = PlatformStat.__table__
+    upsert_add(connection, table, [{'metric': 'users', 'value': 2}, {'metric': 'test', 'value': 5}], ['metric'])
+    db.session.commit()
+    monkeypatch.undo()
+
+    totals = StatsService.totals()
+    assert totals['users'] == 6
+    assert totals['test'] == 5
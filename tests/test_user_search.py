@@ -0,0 +1,62 @@
+"""
+Поиск пользователей в админке: подстроки имени и email без учёта регистра
+(слова короче трёх символов в индексе FTS5 - по началу слов)
+"""
+import pytest
+from database import db
+from models.user import User
+from services.search_service import SearchService
+
+
+def found_names(query):
+    return {user.name for user in User.query.filter(User.id.in_(SearchService.matching_ids('users', query)))}
+
+
+@pytest.mark.parametrize('backend', ['fts5', 'like'])
+@pytest.mark.parametrize('query', ['Пе', 'пе', 'пЕТ', 'петров', 'ПЕТР ПЕ'])
+def test_cyrillic_query_ignores_case(make_app, backend, query):
+    make_app(SEARCH_BACKEND=backend)
+    assert SearchService.active['users'].name == backend
+    assert 'Петр Петров' in found_names(query)
+
+
+@pytest.mark.parametrize('backend', ['fts5', 'like'])
+def test_short_query_matches_yo(make_app, backend):
+    make_app(SEARCH_BACKEND=backend)
+    db.session.add(User(name='Пётр Ёлкин', email='elkin@example.com', password='x', role='applicant'))
+    db.session.commit()
+    assert found_names('Ел') == {'Пётр Ёлкин'}
+    assert found_names('ёл') == {'Пётр Ёлкин'}
+    assert found_names('пё') == {'Петр Петров', 'Пётр Ёлкин'}
+
+
+def test_short_words_use_word_starts(app):
+    db.session.add(User(name='Анна Ли', email='li@example.com', password='x', role='applicant'))
+    db.session.commit()
+    assert found_names('ли') == {'Анна Ли'}
+    assert found_names('ли ан') == {'Анна Ли'}
+    # не с начала слова: "ов" в "Петров"
+    assert found_names('ов') == set()
+    # короткое слово вместе с длинным
+    assert found_names('пе петров') == {'Петр Петров'}
+    assert found_names('ли петров') == set()
+
+    # после изменения имени старые начала слов удаляются
+    user = User.query.filter_by(email='li@example.com').one()
+    user.name = 'Анна Ким'
+    db.session.commit()
+    assert found_names('ли') == set()
+    assert found_names('ки') == {'Анна Ким'}
+    assert found_names('li') == {'Анна Ким'}
+    user.email = 'kim@example.com'
+    db.session.commit()
+    assert found_names('li') == set()
+
+
+def test_like_wildcards_are_literal(make_app):
+    make_app(SEARCH_BACKEND='like')
+    assert found_names('%') == set()
+    assert found_names('_') == set()
+    db.session.add(User(name='100% Тест', email='percent@example.com', password='x', role='applicant'))
+    db.session.commit()
+    assert found_names('0%') == {'100% Тест'}